@@ -0,0 +1,110 @@
+import json
+import os
+import platform
+import sys
+import time
+from functools import lru_cache
+
+import numpy as np
+
+DEFAULT_BLOCK_SIZE = 64
+BLOCK_CANDIDATES = (16, 32, 64, 128, 256)
+CACHE_PATH = os.environ.get(
+    "MATMUL_TUNE_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "matrix_benchmark", "block_sizes.json"),
+)
+
+_caches = {}
+
+@lru_cache(maxsize=None)
+def cpu_model():
+    # Se consulta dentro de rutas medidas (resolve_block_size): se lee una vez
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine() or "unknown"
+
+def _size_bucket(n):
+    return 1 << max(0, int(n) - 1).bit_length()
+
+def _key(kernel, n, threads):
+    return f"{kernel}|n={_size_bucket(n)}|t={threads or 1}"
+
+def load_cache(path=CACHE_PATH):
+    # Se lee una vez por proceso: las funciones bloqueadas consultan la
+    # caché en cada llamada.
+    if path not in _caches:
+        try:
+            with open(path) as f:
+                _caches[path] = json.load(f)
+        except (OSError, ValueError):
+            _caches[path] = {}
+    return _caches[path]
+
+def save_cache(cache, path=CACHE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def lookup_block_size(kernel, n, threads=None, path=CACHE_PATH):
+    entry = load_cache(path).get(cpu_model(), {}).get(_key(kernel, n, threads))
+    return entry["block_size"] if entry else None
+
+def resolve_block_size(kernel, n, threads=None):
+    # Sin block_size explícito: el afinado para esta CPU, o el de siempre
+    return lookup_block_size(kernel, n, threads) or DEFAULT_BLOCK_SIZE
+
+def tune_block_size(kernel, n, threads=None, candidates=BLOCK_CANDIDATES, repeats=3,
+                    seed=0, path=CACHE_PATH):
+    from matrix_multiplier import multiply_blocked, multiply_numba_blocked, get_numba_threads
+
+    if kernel == "numba_blocked" and threads is None:
+        threads = get_numba_threads()
+    funcs = {
+        "blocked": lambda A, B, bs: multiply_blocked(A, B, bs),
+        "numba_blocked": lambda A, B, bs: multiply_numba_blocked(A, B, block_size=bs, threads=threads),
+    }
+    func = funcs[kernel]
+    rng = np.random.default_rng(seed)
+    A = rng.random((n, n))
+    B = rng.random((n, n))
+
+    # Bloques mayores que n equivalen a n; si no queda ninguno (n menor que
+    # todos los candidatos) se prueba un único bloque de n
+    candidates = [bs for bs in candidates if bs <= n] or [max(1, n)]
+    timings = {}
+    for bs in candidates:
+        func(A, B, bs)  # calentamiento / compilación JIT
+        t = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func(A, B, bs)
+            t = min(t, time.perf_counter() - start)
+        timings[bs] = t
+    best = min(timings, key=timings.get)
+
+    cache = load_cache(path)
+    cache.setdefault(cpu_model(), {})[_key(kernel, n, threads)] = {
+        "block_size": best,
+        "seconds": timings[best],
+        "timings": {str(bs): t for bs, t in timings.items()},
+    }
+    save_cache(cache, path)
+    return best
+
+if __name__ == "__main__":
+    sizes = [int(x) for x in sys.argv[1:]] or [256, 512, 1024]
+    for n in sizes:
+        print(f"blocked n={n}: block_size={tune_block_size('blocked', n)}")
+        for t in (1, 2, 4, 8):
+            try:
+                print(f"numba_blocked n={n} t={t}: block_size={tune_block_size('numba_blocked', n, threads=t)}")
+            except Exception as e:
+                print(f"numba_blocked n={n} t={t} error:", e)
+    print(f"Caché: {CACHE_PATH} ({cpu_model()})")
@@ -0,0 +1,572 @@
+import argparse
+import csv
+import fnmatch
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+
+import timing
+from autotune import cpu_model
+from memory_profile import profile_memory
+from roofline import count_events, host_peaks, print_roofline, work_model
+from matrix_multiplier import (
+    multiply_basic, strassen, strassen_adaptive, strassen_parallel, multiply_blocked, multiply_numpy,
+    multiply_sparse, generate_sparse_matrix, multiply_numba_basic, multiply_numba_parallel,
+    multiply_numba_blocked, multiply_numba_packed, multiply_numba_winograd, reset_numba_threads,
+    strassen_parallel_threads,
+)
+from sparse_multiplier import spgemm
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_ROOT = os.path.normpath(os.path.join(_HERE, "..", "..", ".."))
+# Almacén de resultados: solo se añade, nunca se sobrescribe
+STORE_DIR = os.environ.get(
+    "MATMUL_BENCH_STORE",
+    os.path.normpath(os.path.join(_HERE, "..", "..", "data", "runs")),
+)
+RESULT_FIELDS = ["RunID", "Kernel", "Size", "DType", "Threads", "BlockSize", "Runs", "Number",
+                 "AverageWall", "MedianWall", "MinWall", "P95Wall", "StdWall", "CILow", "CIHigh",
+                 "Outliers", "AverageCPU", "PeakMemoryKB", "PeakDeltaKB", "RSSPeakDeltaKB",
+                 "TracedPeakKB", "GFLOPS", "ArithIntensity", "Cycles", "Instructions", "IPC",
+                 "LLCMisses", "PageFaults", "Samples", "Extra"]
+
+# Mismo barrido que TASK3/code/python/test_matrix_multiplier.py
+DEFAULT_SWEEP = {
+    "kernels": ["*"],
+    "sizes": [128, 256, 512, 1024],
+    "threads": [1, 2, 4, 8],
+    "dtypes": ["float64"],
+    "block_sizes": [None],
+    # Repeticiones adaptativas (ver timing.measure)
+    "min_runs": timing.MIN_RUNS,
+    "max_runs": timing.MAX_RUNS,
+    "target_rel_ci": timing.TARGET_REL_CI,
+    "max_time_s": timing.MAX_CELL_S,
+    "warmup": 1,
+    "sparsity": 0.99,
+    # Llamada extra con muestreo de RSS y tracemalloc (ver memory_profile)
+    "memory": False,
+    # Llamada extra con contadores perf_event (ciclos, instrucciones, fallos de LLC)
+    "counters": False,
+    # Al acabar, resumen roofline frente a STREAM y el pico DGEMM del host
+    "roofline": False,
+    # Cada celda en un proceso nuevo con los hilos fijados por variables de
+    # entorno; affinity: CPUs permitidas ("0-3,6" o lista), None = todas
+    "isolate": False,
+    "affinity": None,
+    "cell_timeout_s": None,
+}
+# Variables que fijan los hilos de BLAS/OpenMP/Numba en el proceso aislado
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "BLIS_NUM_THREADS", "NUMBA_NUM_THREADS")
+# Prefijo de las líneas que el proceso aislado envía al padre por stdout
+_MESSAGE = "@@harness "
+
+
+class Kernel:
+    """Motor de multiplicación registrado en el harness.
+
+    func(A, B, **params) recibe threads y block_size solo si el motor los
+    declara (threaded / blocked). inputs indica qué operandos espera:
+    "list" (listas de Python), "numpy" o "sparse" (CSR). effective_threads,
+    si se da, devuelve los hilos que el motor usará de verdad: las celdas en
+    las que no coinciden con los pedidos se omiten.
+    """
+
+    def __init__(self, name, func, inputs="numpy", pow2=False, threaded=False,
+                 blocked=False, dtypes=None, max_size=None, source="TASK3",
+                 effective_threads=None):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.pow2 = pow2
+        self.threaded = threaded
+        self.blocked = blocked
+        # None: cualquier dtype; las listas de Python solo tienen float64
+        self.dtypes = ("float64",) if inputs == "list" and dtypes is None else dtypes
+        self.max_size = max_size
+        self.source = source
+        self.effective_threads = effective_threads
+
+    @property
+    def sparse(self):
+        return self.inputs == "sparse"
+
+    def skip_reason(self, n, dtype, threads=None):
+        # Motivo por el que esta celda no aplica, o None
+        if self.pow2 and n & (n - 1):
+            return "n no es potencia de dos"
+        if self.max_size is not None and n > self.max_size:
+            return f"n > {self.max_size}"
+        if self.dtypes is not None and dtype not in self.dtypes:
+            return f"dtype {dtype} no soportado"
+        if threads is not None and self.effective_threads is not None:
+            effective = self.effective_threads(threads)
+            if effective != threads:
+                return f"se ejecutaría con {effective} hilo(s), no {threads}"
+        return None
+
+    def flags(self):
+        names = ("pow2", "threaded", "blocked", "sparse")
+        return [f for f in names if getattr(self, f)]
+
+
+KERNELS = {}
+
+
+def register(name, func, **capabilities):
+    # Un motor nuevo solo necesita registrarse aquí (o desde su módulo) para
+    # entrar en cualquier barrido
+    KERNELS[name] = Kernel(name, func, **capabilities)
+    return KERNELS[name]
+
+
+register("basic", lambda A, B: multiply_basic(A, B), inputs="list")
+register("strassen", lambda A, B: strassen(A, B), pow2=True)
+register("strassen_adaptive", lambda A, B: strassen_adaptive(A, B))
+register("strassen_parallel", lambda A, B, threads: strassen_parallel(A, B, threads=threads), threaded=True,
+         effective_threads=strassen_parallel_threads)
+register("blocked", lambda A, B, block_size: multiply_blocked(A, B, block_size), blocked=True)
+register("numpy", lambda A, B: multiply_numpy(A, B))
+register("numba_basic", lambda A, B: multiply_numba_basic(A, B, threads=1))
+register("numba_parallel", lambda A, B, threads: multiply_numba_parallel(A, B, threads=threads), threaded=True)
+register("numba_blocked", lambda A, B, threads, block_size: multiply_numba_blocked(A, B, block_size=block_size, threads=threads),
+         threaded=True, blocked=True)
+register("numba_packed", lambda A, B, threads: multiply_numba_packed(A, B, threads=threads), threaded=True)
+register("numba_winograd", lambda A, B, threads, block_size: multiply_numba_winograd(A, B, block_size=block_size, threads=threads),
+         threaded=True, blocked=True)
+register("sparse_scipy", lambda A, B: multiply_sparse(A, B), inputs="sparse")
+register("spgemm_numba", lambda A, B, threads: spgemm(A, B, threads=threads), inputs="sparse", threaded=True)
+register("spgemm_planned", lambda A, B, threads: spgemm(A, B, threads=threads, reuse=True), inputs="sparse", threaded=True)
+
+
+def _load_task_module(task):
+    # Los matrix_multiplier.py de TASK1/TASK2 se llaman igual que el de TASK3:
+    # se cargan por ruta con otro nombre de módulo
+    path = os.path.join(_ROOT, task, "code", "python", "matrix_multiplier.py")
+    spec = importlib.util.spec_from_file_location(f"{task.lower()}_matrix_multiplier", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def register_legacy():
+    # Versiones originales de TASK1 y TASK2, para compararlas en el mismo almacén
+    try:
+        t1 = _load_task_module("TASK1")
+        t2 = _load_task_module("TASK2")
+    except (OSError, ImportError) as e:
+        print("No se pudieron cargar los motores de TASK1/TASK2:", e)
+        return
+    register("task1_basic", t1.multiply_matrices, inputs="list", source="TASK1")
+    register("task2_basic", t2.multiply_basic, inputs="list", source="TASK2")
+    register("task2_strassen", t2.strassen, inputs="list", pow2=True, source="TASK2")
+    register("task2_blocked", lambda A, B, block_size: t2.multiply_blocked(A, B, block_size or 64),
+             inputs="list", blocked=True, source="TASK2")
+    register("task2_sparse", t2.multiply_sparse, inputs="sparse", source="TASK2")
+
+
+register_legacy()
+
+
+def select_kernels(patterns):
+    # Nombres o patrones fnmatch ("numba_*"), en orden de registro
+    return [k for name, k in KERNELS.items() if any(fnmatch.fnmatch(name, p) for p in patterns)]
+
+
+def expand_sweep(sweep):
+    # Barrido declarativo -> celdas (kernel, n, dtype, threads, block_size).
+    # Los ejes que un motor no usa se reducen a None en lugar de repetirse.
+    spec = dict(DEFAULT_SWEEP, **sweep)
+    cells = []
+    for kernel in select_kernels(spec["kernels"]):
+        threads = spec["threads"] if kernel.threaded else [None]
+        blocks = spec["block_sizes"] if kernel.blocked else [None]
+        for n, dtype, t, bs in itertools.product(spec["sizes"], spec["dtypes"], threads, blocks):
+            reason = kernel.skip_reason(n, dtype, t)
+            if reason is None:
+                cells.append((kernel, n, dtype, t, bs))
+    return cells
+
+
+def make_inputs(kernel, n, dtype, sparsity, seeds=(42, 1337)):
+    # Semillas de A y B como en los scripts de benchmark
+    if kernel.sparse:
+        return tuple(generate_sparse_matrix(n, sparsity=sparsity, seed=s).astype(dtype) for s in seeds)
+    A, B = (np.random.default_rng(s).random((n, n)) for s in seeds)
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        A, B = A * 100, B * 100  # valores 0..99, dentro del rango de int8
+    if kernel.inputs == "list":
+        return A.tolist(), B.tolist()
+    return A.astype(dtype), B.astype(dtype)
+
+
+class ResultStore:
+    """Resultados en append: runs.jsonl (un registro por ejecución) y
+    results.csv (una fila por celda, con RunID)."""
+
+    def __init__(self, path=STORE_DIR):
+        self.path = path
+        self.runs_file = os.path.join(path, "runs.jsonl")
+        self.results_file = os.path.join(path, "results.csv")
+        self._checked = False
+
+    def start_run(self, sweep, argv=None):
+        os.makedirs(self.path, exist_ok=True)
+        run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-" + uuid.uuid4().hex[:6]
+        record = {
+            "run_id": run_id,
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "host": platform.node(),
+            "cpu_model": cpu_model(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "argv": argv if argv is not None else sys.argv[1:],
+            "sweep": sweep,
+        }
+        with open(self.runs_file, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        return run_id
+
+    def _upgrade(self):
+        # Almacén escrito con otras columnas: se reescribe una vez con las
+        # actuales (las que falten quedan vacías), sin perder filas
+        with open(self.results_file, newline="") as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames == RESULT_FIELDS:
+                return
+            rows = list(reader)
+        fields = RESULT_FIELDS + [k for k in reader.fieldnames or [] if k not in RESULT_FIELDS]
+        tmp = self.results_file + ".tmp"
+        with open(tmp, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, restval="")
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp, self.results_file)
+
+    def append(self, row):
+        # Una fila por llamada y a disco enseguida: una ejecución cortada
+        # conserva lo que ya midió
+        new = not os.path.exists(self.results_file) or os.path.getsize(self.results_file) == 0
+        if not new and not self._checked:
+            self._upgrade()
+        self._checked = True
+        with open(self.results_file, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            if new:
+                writer.writeheader()
+            writer.writerow(row)
+
+    def runs(self):
+        try:
+            with open(self.runs_file) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except OSError:
+            return []
+
+    def results(self, run_id=None):
+        try:
+            with open(self.results_file, newline="") as f:
+                rows = list(csv.DictReader(f))
+        except OSError:
+            return []
+        return [r for r in rows if run_id is None or r["RunID"] == run_id]
+
+    def latest_run(self):
+        runs = self.runs()
+        return runs[-1]["run_id"] if runs else None
+
+
+def _kb(value):
+    return f"{value:.2f}" if value is not None else ""
+
+
+def _opt(value, fmt):
+    return format(value, fmt) if value is not None else ""
+
+
+def _row(kernel, n, dtype, threads, block_size, wall_times, cpu_times, number, peak_mem,
+         memory=None, work=None, events=None, extra=None):
+    s = timing.summarize(wall_times)
+    memory = memory or {}
+    events = events or {}
+    flops, nbytes = work or (None, None)
+    return {
+        "RunID": "",
+        "Kernel": kernel.name,
+        "Size": n,
+        "DType": dtype,
+        "Threads": threads if threads is not None else "",
+        "BlockSize": block_size if block_size is not None else "",
+        "Runs": s["n"],
+        "Number": number,
+        "AverageWall": f"{s['mean']:.9f}",
+        "MedianWall": f"{s['median']:.9f}",
+        "MinWall": f"{s['min']:.9f}",
+        "P95Wall": f"{s['p95']:.9f}",
+        "StdWall": f"{s['std']:.9f}",
+        "CILow": f"{s['ci_low']:.9f}",
+        "CIHigh": f"{s['ci_high']:.9f}",
+        "Outliers": s["outliers"],
+        "AverageCPU": f"{sum(cpu_times) / len(cpu_times):.9f}",
+        "PeakMemoryKB": f"{peak_mem:.2f}",
+        "PeakDeltaKB": _kb(memory.get("peak_delta_kb")),
+        "RSSPeakDeltaKB": _kb(memory.get("rss_peak_delta_kb")),
+        "TracedPeakKB": _kb(memory.get("traced_peak_delta_kb")),
+        # GFLOP/s sobre la mediana; intensidad = flops / bytes obligatorios
+        "GFLOPS": _opt(flops / s["median"] / 1e9 if flops else None, ".4f"),
+        "ArithIntensity": _opt(flops / nbytes if flops and nbytes else None, ".4f"),
+        "Cycles": _opt(events.get("cycles"), "d"),
+        "Instructions": _opt(events.get("instructions"), "d"),
+        "IPC": _opt(events.get("ipc"), ".3f"),
+        "LLCMisses": _opt(events.get("llc_misses"), "d"),
+        "PageFaults": _opt(events.get("page_faults"), "d"),
+        "Samples": ";".join(f"{t:.9g}" for t in wall_times),
+        "Extra": extra or "",
+    }
+
+
+def _label(kernel, n, dtype, threads, block_size):
+    return (f"{kernel.name} n={n} {dtype}" + (f" threads={threads}" if threads is not None else "")
+            + (f" block_size={block_size}" if block_size is not None else ""))
+
+
+def run_cell(spec, kernel, n, dtype, threads, block_size, inputs=None):
+    # Mide una celda en este proceso y devuelve su fila (sin RunID)
+    A, B = inputs or make_inputs(kernel, n, dtype, spec["sparsity"])
+    params = {}
+    if kernel.threaded:
+        params["threads"] = threads
+    if kernel.blocked:
+        params["block_size"] = block_size
+    func = lambda X, Y: kernel.func(X, Y, **params)
+    wall_times, cpu_times, number, peak_mem = timing.measure(
+        func, A, B, spec["min_runs"], spec["max_runs"],
+        spec["target_rel_ci"], spec["max_time_s"], spec["warmup"])
+    # Después de medir tiempos: el perfilado de memoria ralentiza la llamada
+    memory = profile_memory(func, A, B) if spec["memory"] else None
+    events = count_events(func, A, B) if spec["counters"] else None
+    work = work_model(A, B, n, np.dtype(dtype).itemsize, kernel.sparse)
+    extra = f"nnz={A.nnz}" if kernel.sparse else None
+    return _row(kernel, n, dtype, threads, block_size, wall_times, cpu_times, number, peak_mem,
+                memory, work, events, extra)
+
+
+def parse_cpus(affinity):
+    # "0-3,6" -> [0, 1, 2, 3, 6]; una lista se devuelve tal cual
+    if affinity is None or isinstance(affinity, (list, tuple)):
+        return affinity
+    cpus = []
+    for part in str(affinity).split(","):
+        lo, _, hi = part.partition("-")
+        cpus.extend(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+
+def _isolated_env(threads):
+    # Sin hilos explícitos (motores no threaded) se fijan todos los núcleos,
+    # como tendría un proceso recién arrancado
+    value = str(threads or os.cpu_count() or 1)
+    env = dict(os.environ)
+    env.update({name: value for name in THREAD_ENV_VARS})
+    return env
+
+
+def run_isolated(spec, kernel, n, dtype, threads, block_size):
+    # Ejecuta la celda en un intérprete nuevo (python harness.py --cell ...).
+    # El hijo envía su fila por stdout en una línea con _MESSAGE; el resto de
+    # su salida (avisos de Numba, etc.) se reenvía tal cual.
+    payload = json.dumps({"spec": spec, "cell": [kernel.name, n, dtype, threads, block_size]})
+    cpus = parse_cpus(spec["affinity"])
+    if cpus and not hasattr(os, "sched_setaffinity"):
+        raise RuntimeError("afinidad de CPU no disponible en esta plataforma")
+    # La afinidad se fija antes del exec: la heredan todos los hilos del hijo,
+    # incluidos los pools de BLAS y Numba que se crean al importar
+    preexec = (lambda: os.sched_setaffinity(0, cpus)) if cpus else None
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--cell", payload],
+                            env=_isolated_env(threads), cwd=_HERE, stdout=subprocess.PIPE,
+                            text=True, preexec_fn=preexec)
+    timer = None
+    if spec["cell_timeout_s"]:
+        timer = threading.Timer(spec["cell_timeout_s"], proc.kill)
+        timer.start()
+    row = error = None
+    try:
+        for line in proc.stdout:
+            if not line.startswith(_MESSAGE):
+                sys.stdout.write(line)
+                continue
+            message = json.loads(line[len(_MESSAGE):])
+            if "row" in message:
+                row = message["row"]
+            else:
+                error = message["error"]
+        proc.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+    if error is not None:
+        raise RuntimeError(error)
+    if row is None:
+        raise RuntimeError(f"el proceso aislado terminó con código {proc.returncode} sin resultado")
+    return row
+
+
+def _cell_worker(payload):
+    # Lado hijo de run_isolated
+    message = json.loads(payload)
+    spec = message["spec"]
+    name, n, dtype, threads, block_size = message["cell"]
+    try:
+        row = run_cell(spec, KERNELS[name], n, dtype, threads, block_size)
+        out = {"row": row}
+    except Exception as e:
+        out = {"error": f"{type(e).__name__}: {e}"}
+    print(_MESSAGE + json.dumps(out), flush=True)
+
+
+def run_sweep(sweep, store=None, argv=None):
+    # Ejecuta todas las celdas del barrido y devuelve el RunID
+    store = store or ResultStore()
+    spec = dict(DEFAULT_SWEEP, **sweep)
+    cells = expand_sweep(spec)
+    run_id = store.start_run(spec, argv)
+    mode = " (procesos aislados)" if spec["isolate"] else ""
+    print(f"Run {run_id}: {len(cells)} celdas{mode} -> {store.results_file}")
+    inputs = {}
+    for kernel, n, dtype, threads, block_size in cells:
+        label = _label(kernel, n, dtype, threads, block_size)
+        try:
+            if spec["isolate"]:
+                row = run_isolated(spec, kernel, n, dtype, threads, block_size)
+            else:
+                key = (kernel.inputs, n, dtype)
+                if key not in inputs:
+                    inputs.clear()  # solo se guardan los operandos de la celda actual
+                    inputs[key] = make_inputs(kernel, n, dtype, spec["sparsity"])
+                try:
+                    row = run_cell(spec, kernel, n, dtype, threads, block_size, inputs[key])
+                finally:
+                    if kernel.threaded:
+                        reset_numba_threads()
+        except Exception as e:
+            print(f" [{label}] error:", e)
+            continue
+        row["RunID"] = run_id
+        store.append(row)
+        rel_ci = (float(row["CIHigh"]) - float(row["CILow"])) / 2 / float(row["AverageWall"])
+        mem_note = f", pico +{float(row['PeakDeltaKB']) / 1024:.1f} MB" if row["PeakDeltaKB"] else ""
+        print(f" [{label}] mediana {float(row['MedianWall']):.6f}s ±{rel_ci * 100:.1f}% "
+              f"(min {float(row['MinWall']):.6f}s, p95 {float(row['P95Wall']):.6f}s, "
+              f"{row['Runs']}×{row['Number']}, {row['Outliers']} atípicos{mem_note}) {row['GFLOPS']} GFLOP/s")
+    if spec["roofline"]:
+        print_roofline(store.results(run_id), host_peaks())
+    return run_id
+
+
+def _cell_key(row):
+    return (row["Kernel"], row["Size"], row["DType"], row["Threads"], row["BlockSize"])
+
+
+def compare_runs(baseline_id, candidate_id, store=None):
+    # Celdas comunes de dos ejecuciones -> [(clave, resultado de timing.compare)]
+    store = store or ResultStore()
+    baseline = {_cell_key(r): r for r in store.results(baseline_id)}
+    report = []
+    for row in store.results(candidate_id):
+        base = baseline.get(_cell_key(row))
+        if base is None or not base["Samples"] or not row["Samples"]:
+            continue
+        samples = [[float(t) for t in r["Samples"].split(";")] for r in (base, row)]
+        report.append((_cell_key(row), timing.compare(*samples)))
+    return report
+
+
+def print_comparison(report):
+    for (kernel, n, dtype, threads, block_size), result in report:
+        cell = f"{kernel} n={n} {dtype}" + (f" t={threads}" if threads else "") + (f" bs={block_size}" if block_size else "")
+        flag = {"slower": "REGRESIÓN", "faster": "mejora"}.get(result["status"], "")
+        print(f" {cell:45s} x{result['ratio']:.3f}  p={result['p_slower']:.4f}  {flag}")
+    slower = sum(r["status"] == "slower" for _, r in report)
+    print(f"{len(report)} celdas comparadas, {slower} más lentas")
+    return slower
+
+
+def load_sweep(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de multiplicación de matrices")
+    parser.add_argument("--sweep", help="barrido en JSON (mismas claves que DEFAULT_SWEEP)")
+    parser.add_argument("--kernels", nargs="+", help="nombres o patrones, p. ej. 'numba_*'")
+    parser.add_argument("--sizes", nargs="+", type=int)
+    parser.add_argument("--threads", nargs="+", type=int)
+    parser.add_argument("--dtypes", nargs="+")
+    parser.add_argument("--block-sizes", nargs="+", type=int)
+    parser.add_argument("--min-runs", type=int)
+    parser.add_argument("--max-runs", type=int)
+    parser.add_argument("--target-rel-ci", type=float, help="semiancho relativo del IC95 buscado (0.02 = ±2%%)")
+    parser.add_argument("--max-time-s", type=float, help="tiempo máximo de medida por celda")
+    parser.add_argument("--warmup", type=int)
+    parser.add_argument("--sparsity", type=float)
+    parser.add_argument("--memory", action="store_true", default=None,
+                        help="pico de memoria por celda (RSS muestreado + tracemalloc)")
+    parser.add_argument("--counters", action="store_true", default=None,
+                        help="contadores perf_event por celda (ciclos, instrucciones, fallos de LLC)")
+    parser.add_argument("--roofline", action="store_true", default=None,
+                        help="resumen roofline al terminar (mide STREAM y DGEMM una vez por host)")
+    parser.add_argument("--isolate", action="store_true", default=None,
+                        help="cada celda en un proceso nuevo con los hilos fijados por entorno")
+    parser.add_argument("--affinity", help="CPUs de los procesos aislados, p. ej. 0-3,6")
+    parser.add_argument("--cell-timeout-s", type=float, help="con --isolate: mata la celda pasado este tiempo")
+    parser.add_argument("--cell", help=argparse.SUPPRESS)
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--list", action="store_true", help="muestra los motores registrados")
+    parser.add_argument("--dry-run", action="store_true", help="muestra las celdas sin medir")
+    parser.add_argument("--compare", metavar="BASELINE", help="RunID de referencia: marca las celdas más lentas")
+    parser.add_argument("--against", metavar="RUN", help="con --compare: compara esta ejecución sin medir otra")
+    args = parser.parse_args(argv)
+    if args.cell:
+        return _cell_worker(args.cell)
+    store = ResultStore(args.store)
+
+    if args.compare and args.against:
+        return print_comparison(compare_runs(args.compare, args.against, store))
+
+    if args.list:
+        for k in KERNELS.values():
+            print(f"{k.name:20s} {k.source:6s} {k.inputs:7s} {','.join(k.flags())}")
+        return None
+
+    sweep = load_sweep(args.sweep) if args.sweep else {}
+    for key in ("kernels", "sizes", "threads", "dtypes", "block_sizes", "min_runs", "max_runs",
+                "target_rel_ci", "max_time_s", "warmup", "sparsity", "memory", "counters", "roofline",
+                "isolate", "affinity", "cell_timeout_s"):
+        value = getattr(args, key)
+        if value is not None:
+            sweep[key] = value
+    if args.dry_run:
+        for kernel, n, dtype, threads, block_size in expand_sweep(sweep):
+            print(kernel.name, n, dtype, threads, block_size)
+        return None
+    run_id = run_sweep(sweep, store, argv if argv is not None else sys.argv[1:])
+    if args.compare:
+        return print_comparison(compare_runs(args.compare, run_id, store))
+    return None
+
+
+if __name__ == "__main__":
+    # Con --compare el código de salida es el número de regresiones (para CI)
+    sys.exit(min(main() or 0, 125))
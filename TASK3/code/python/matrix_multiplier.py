@@ -1,7 +1,20 @@
 import os
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 import numpy as np
 from scipy.sparse import csr_matrix
 
+from autotune import resolve_block_size
+from sparse_multiplier import random_csr
+
+try:
+    from threadpoolctl import threadpool_limits
+    THREADPOOLCTL_AVAILABLE = True
+except ImportError:
+    THREADPOOLCTL_AVAILABLE = False
+
 def get_blas_threads():
     num = None
     try:
@@ -22,6 +35,34 @@ def get_blas_threads():
                     pass
     return num
 
+# Acumulador "ancho" para accumulate="wide": float32 suma en float64,
+# int8/int16 en int32, etc.
+_WIDE_ACCUMULATOR = {
+    np.dtype(np.float16): np.dtype(np.float32),
+    np.dtype(np.float32): np.dtype(np.float64),
+    np.dtype(np.int8): np.dtype(np.int32),
+    np.dtype(np.int16): np.dtype(np.int32),
+    np.dtype(np.uint8): np.dtype(np.int32),
+    np.dtype(np.uint16): np.dtype(np.int32),
+    np.dtype(np.int32): np.dtype(np.int64),
+}
+
+def _as_matrix(A):
+    # Sin copia si A ya es un ndarray C-contiguo; conserva el dtype de
+    # entrada (las listas de Python quedan en float64). Las entradas nunca
+    # se modifican, así que no hace falta una copia defensiva.
+    return np.ascontiguousarray(A)
+
+def result_dtype(A, B, accumulate=None):
+    # accumulate=None: el dtype de las entradas; "wide": su acumulador ancho;
+    # cualquier otro valor se interpreta como dtype explícito.
+    dtype = np.result_type(A, B)
+    if accumulate is None:
+        return dtype
+    if accumulate == "wide":
+        return _WIDE_ACCUMULATOR.get(dtype, dtype)
+    return np.dtype(accumulate)
+
 def multiply_basic(A, B):
     n = len(A)
     C = [[0.0]*n for _ in range(n)]
@@ -33,22 +74,28 @@ def multiply_basic(A, B):
             C[i][j] = s
     return C
 
-def strassen(A, B):
-    A = np.array(A, dtype=np.float64)
-    B = np.array(B, dtype=np.float64)
+def strassen(A, B, accumulate=None):
+    # Se convierte una sola vez al dtype de acumulación (ver result_dtype);
+    # los cuadrantes de la recursión son vistas y no se copian
+    A = np.asarray(A)
+    B = np.asarray(B)
+    dtype = result_dtype(A, B, accumulate)
+    return _strassen_rec(A.astype(dtype, copy=False), B.astype(dtype, copy=False))
+
+def _strassen_rec(A, B):
     n = A.shape[0]
     if n == 1:
         return A * B
     mid = n // 2
     A11, A12, A21, A22 = A[:mid,:mid], A[:mid,mid:], A[mid:,:mid], A[mid:,mid:]
     B11, B12, B21, B22 = B[:mid,:mid], B[:mid,mid:], B[mid:,:mid], B[mid:,mid:]
-    M1 = strassen(A11 + A22, B11 + B22)
-    M2 = strassen(A21 + A22, B11)
-    M3 = strassen(A11, B12 - B22)
-    M4 = strassen(A22, B21 - B11)
-    M5 = strassen(A11 + A12, B22)
-    M6 = strassen(A21 - A11, B11 + B12)
-    M7 = strassen(A12 - A22, B21 + B22)
+    M1 = _strassen_rec(A11 + A22, B11 + B22)
+    M2 = _strassen_rec(A21 + A22, B11)
+    M3 = _strassen_rec(A11, B12 - B22)
+    M4 = _strassen_rec(A22, B21 - B11)
+    M5 = _strassen_rec(A11 + A12, B22)
+    M6 = _strassen_rec(A21 - A11, B11 + B12)
+    M7 = _strassen_rec(A12 - A22, B21 + B22)
     C11 = M1 + M4 - M5 + M7
     C12 = M3 + M5
     C21 = M2 + M4
@@ -57,23 +104,220 @@ def strassen(A, B):
     bottom = np.hstack((C21, C22))
     return np.vstack((top, bottom))
 
-def multiply_blocked(A, B, block_size=64):
-    A = np.array(A, dtype=np.float64)
-    B = np.array(B, dtype=np.float64)
+STRASSEN_CUTOFF = 256
+_tuned_cutoffs = {}
+
+def _workspace(ws, name, depth, shape, dtype):
+    buf = ws.get((name, depth))
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = np.empty(shape, dtype=dtype)
+        ws[(name, depth)] = buf
+    return buf
+
+def _peel_fixup(A, B, C, me, ke, ne, P=None):
+    m, k = A.shape
+    n = B.shape[1]
+    if ke != k:
+        np.multiply.outer(A[:me, ke], B[ke, :ne], out=P)
+        C[:me, :ne] += P
+    if ne != n:
+        np.matmul(A[:me, :], B[:, ne], out=C[:me, ne])
+    if me != m:
+        np.matmul(A[me, :], B, out=C[me, :])
+
+def _strassen_into(A, B, C, cutoff, ws, depth=0):
+    m, k = A.shape
+    n = B.shape[1]
+    if min(m, k, n) <= cutoff:
+        np.matmul(A, B, out=C)
+        return
+    me, ke, ne = m - m % 2, k - k % 2, n - n % 2
+    if (me, ke, ne) != (m, k, n):
+        # Peeling dinámico: Strassen sobre la parte par y la fila/columna
+        # sobrante se corrige con productos de rango 1 / matriz-vector.
+        _strassen_into(A[:me, :ke], B[:ke, :ne], C[:me, :ne], cutoff, ws, depth)
+        _peel_fixup(A, B, C, me, ke, ne, _workspace(ws, "peel", depth, (me, ne), C.dtype) if ke != k else None)
+        return
+
+    hm, hk, hn = m // 2, k // 2, n // 2
+    A11, A12, A21, A22 = A[:hm, :hk], A[:hm, hk:], A[hm:, :hk], A[hm:, hk:]
+    B11, B12, B21, B22 = B[:hk, :hn], B[:hk, hn:], B[hk:, :hn], B[hk:, hn:]
+    C11, C12, C21, C22 = C[:hm, :hn], C[:hm, hn:], C[hm:, :hn], C[hm:, hn:]
+    TA = _workspace(ws, "a", depth, (hm, hk), C.dtype)
+    TB = _workspace(ws, "b", depth, (hk, hn), C.dtype)
+    M = _workspace(ws, "m", depth, (hm, hn), C.dtype)
+
+    def rec(X, Y):
+        _strassen_into(X, Y, M, cutoff, ws, depth + 1)
+
+    np.add(A11, A22, out=TA); np.add(B11, B22, out=TB); rec(TA, TB)   # M1
+    C11[...] = M; C22[...] = M
+    np.add(A21, A22, out=TA); rec(TA, B11)                            # M2
+    C21[...] = M; C22 -= M
+    np.subtract(B12, B22, out=TB); rec(A11, TB)                       # M3
+    C12[...] = M; C22 += M
+    np.subtract(B21, B11, out=TB); rec(A22, TB)                       # M4
+    C11 += M; C21 += M
+    np.add(A11, A12, out=TA); rec(TA, B22)                            # M5
+    C11 -= M; C12 += M
+    np.subtract(A21, A11, out=TA); np.add(B11, B12, out=TB); rec(TA, TB)  # M6
+    C22 += M
+    np.subtract(A12, A22, out=TA); np.add(B21, B22, out=TB); rec(TA, TB)  # M7
+    C11 += M
+
+def tune_strassen_cutoff(n=1024, candidates=(64, 128, 256, 512, 1024), repeats=2, seed=0):
+    rng = np.random.default_rng(seed)
+    A = rng.random((n, n))
+    B = rng.random((n, n))
+    C = np.empty((n, n))
+    best, best_t = None, float("inf")
+    for cutoff in candidates:
+        ws = {}
+        t = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            _strassen_into(A, B, C, cutoff, ws)
+            t = min(t, time.perf_counter() - start)
+        if t < best_t:
+            best, best_t = cutoff, t
+    return best
+
+def _auto_cutoff(n):
+    # Un tuning por potencia de dos de n y proceso
+    bucket = 1 << max(0, int(n) - 1).bit_length()
+    if bucket not in _tuned_cutoffs:
+        _tuned_cutoffs[bucket] = tune_strassen_cutoff(min(bucket, 2048))
+    return _tuned_cutoffs[bucket]
+
+def strassen_adaptive(A, B, cutoff=STRASSEN_CUTOFF, accumulate=None):
+    # Strassen con corte a BLAS, cualquier tamaño (peeling) y buffers reutilizados.
+    # cutoff="auto" lo elige midiendo en esta máquina.
+    A = _as_matrix(A)
+    B = _as_matrix(B)
+    dtype = result_dtype(A, B, accumulate)
+    A = A.astype(dtype, copy=False)
+    B = B.astype(dtype, copy=False)
+    if cutoff == "auto":
+        cutoff = _auto_cutoff(max(A.shape[0], A.shape[1], B.shape[1]))
+    C = np.empty((A.shape[0], B.shape[1]), dtype=dtype)
+    _strassen_into(A, B, C, max(1, int(cutoff)), {})
+    return C
+
+def _limit_blas_threads(num):
+    try:
+        return threadpool_limits(limits=num, user_api="blas")
+    except Exception:
+        return nullcontext()
+
+def strassen_parallel_threads(threads=None):
+    # Hilos que usa de verdad strassen_parallel: sin threadpoolctl no se
+    # pueden limitar los de BLAS y, si esta es multihilo, cae a serie (1)
+    threads = threads or os.cpu_count() or 1
+    if threads > 1 and not THREADPOOLCTL_AVAILABLE and (get_blas_threads() or os.cpu_count() or 1) > 1:
+        return 1
+    return threads
+
+def _strassen_operands(A, B):
+    h_m, h_k = A.shape[0] // 2, A.shape[1] // 2
+    h_n = B.shape[1] // 2
+    A11, A12, A21, A22 = A[:h_m, :h_k], A[:h_m, h_k:], A[h_m:, :h_k], A[h_m:, h_k:]
+    B11, B12, B21, B22 = B[:h_k, :h_n], B[:h_k, h_n:], B[h_k:, :h_n], B[h_k:, h_n:]
+    return [(A11 + A22, B11 + B22), (A21 + A22, B11), (A11, B12 - B22), (A22, B21 - B11),
+            (A11 + A12, B22), (A21 - A11, B11 + B12), (A12 - A22, B21 + B22)]
+
+def _strassen_combine(M, C):
+    h_m, h_n = C.shape[0] // 2, C.shape[1] // 2
+    M1, M2, M3, M4, M5, M6, M7 = M
+    np.add(M1, M4, out=C[:h_m, :h_n]); C[:h_m, :h_n] += M7; C[:h_m, :h_n] -= M5
+    np.add(M3, M5, out=C[:h_m, h_n:])
+    np.add(M2, M4, out=C[h_m:, :h_n])
+    np.subtract(M1, M2, out=C[h_m:, h_n:]); C[h_m:, h_n:] += M3; C[h_m:, h_n:] += M6
+
+def _plan_parallel(A, B, C, levels, cutoff, jobs, finish):
+    # Despliega los `levels` niveles superiores: las hojas (jobs) son
+    # independientes y se reparten entre hilos; finish combina de abajo arriba.
+    m, k = A.shape
+    n = B.shape[1]
+    if levels == 0 or min(m, k, n) <= cutoff or m % 2 or k % 2 or n % 2:
+        jobs.append((A, B, C))
+        return
+    M = [np.empty((m // 2, n // 2), dtype=C.dtype) for _ in range(7)]
+    for (X, Y), Mi in zip(_strassen_operands(A, B), M):
+        _plan_parallel(X, Y, Mi, levels - 1, cutoff, jobs, finish)
+    finish.append((M, C))
+
+def strassen_parallel(A, B, threads=None, cutoff=STRASSEN_CUTOFF, levels=1, accumulate=None):
+    # Los 7 productos M1..M7 (49 con levels=2) se evalúan en un pool de hilos;
+    # BLAS libera el GIL. Los hilos BLAS se reparten para no sobresuscribir;
+    # si no se pueden limitar, las hojas se calculan en serie con BLAS entera.
+    A = _as_matrix(A)
+    B = _as_matrix(B)
+    dtype = result_dtype(A, B, accumulate)
+    A = A.astype(dtype, copy=False)
+    B = B.astype(dtype, copy=False)
+    threads = threads or os.cpu_count() or 1
+    if strassen_parallel_threads(threads) < threads:
+        warnings.warn("threadpoolctl no disponible: no se pueden limitar los hilos de BLAS, "
+                      "strassen_parallel calcula las hojas en serie", RuntimeWarning, stacklevel=2)
+        threads = 1
+    m, k = A.shape
+    n = B.shape[1]
+    C = np.empty((m, n), dtype=dtype)
+    me, ke, ne = m - m % 2, k - k % 2, n - n % 2
+
+    if cutoff == "auto":
+        cutoff = _auto_cutoff(max(m, k, n))
+    cutoff = max(1, int(cutoff))
+
+    jobs, finish = [], []
+    _plan_parallel(A[:me, :ke], B[:ke, :ne], C[:me, :ne], levels, cutoff, jobs, finish)
+    if threads == 1 or len(jobs) == 1:
+        for job in jobs:
+            _strassen_into(*job, cutoff, {})
+    else:
+        # threadpool_limits aplica el límite al crearse: solo en este camino
+        blas_threads = max(1, (get_blas_threads() or os.cpu_count() or 1) // threads)
+        with _limit_blas_threads(blas_threads), ThreadPoolExecutor(max_workers=threads) as ex:
+            list(ex.map(lambda job: _strassen_into(*job, cutoff, {}), jobs))
+    for M, C_sub in finish:
+        _strassen_combine(M, C_sub)
+    _peel_fixup(A, B, C, me, ke, ne, np.empty((me, ne), dtype=dtype) if ke != k else None)
+    return C
+
+def multiply_blocked(A, B, block_size=None, accumulate=None):
+    A = _as_matrix(A)
+    B = _as_matrix(B)
+    dtype = result_dtype(A, B, accumulate)
+    A = A.astype(dtype, copy=False)
+    B = B.astype(dtype, copy=False)
     n = A.shape[0]
-    C = np.zeros((n, n), dtype=np.float64)
-    for ii in range(0, n, block_size):
-        for kk in range(0, n, block_size):
+    if block_size is None:
+        block_size = resolve_block_size("blocked", n)
+    C = np.zeros((n, B.shape[1]), dtype=dtype)
+    _blocked_into(A, B, C, block_size, {})
+    return C
+
+def _blocked_into(A, B, C, block_size, ws):
+    # C += A @ B por bloques; el producto de cada bloque se escribe en un
+    # buffer del workspace en lugar de crear un temporal nuevo.
+    m, k = A.shape
+    n = B.shape[1]
+    T = _workspace(ws, "blk", 0, (min(block_size, m), min(block_size, n)), C.dtype)
+    for ii in range(0, m, block_size):
+        for kk in range(0, k, block_size):
             Ablk = A[ii:ii+block_size, kk:kk+block_size]
             for jj in range(0, n, block_size):
                 Bblk = B[kk:kk+block_size, jj:jj+block_size]
-                C[ii:ii+block_size, jj:jj+block_size] += Ablk @ Bblk
-    return C
+                Tblk = T[:Ablk.shape[0], :Bblk.shape[1]]
+                np.matmul(Ablk, Bblk, out=Tblk, dtype=C.dtype)
+                C[ii:ii+block_size, jj:jj+block_size] += Tblk
 
-def multiply_numpy(A, B):
-    A = np.array(A, dtype=np.float64)
-    B = np.array(B, dtype=np.float64)
-    return A @ B  # BLAS
+def multiply_numpy(A, B, accumulate=None):
+    # BLAS acepta tanto C como Fortran order: no se fuerza la contigüidad
+    A = np.asarray(A)
+    B = np.asarray(B)
+    dtype = result_dtype(A, B, accumulate)
+    return A.astype(dtype, copy=False) @ B.astype(dtype, copy=False)  # BLAS (float32/float64)
 
 def multiply_sparse(A_sparse, B_sparse):
     if not isinstance(A_sparse, csr_matrix):
@@ -82,18 +326,13 @@ def multiply_sparse(A_sparse, B_sparse):
         B_sparse = csr_matrix(B_sparse)
     return A_sparse.dot(B_sparse)
 
-def generate_sparse_matrix(n, sparsity=0.9, seed=None):
-    if seed is not None:
-        rng = np.random.default_rng(seed)
-        rows = rng.integers(0, n, size=int((1.0 - sparsity) * n * n))
-        cols = rng.integers(0, n, size=rows.size)
-        vals = rng.random(size=rows.size)
-    else:
-        nnz = int((1.0 - sparsity) * n * n)
-        rows = np.random.randint(0, n, size=nnz)
-        cols = np.random.randint(0, n, size=nnz)
-        vals = np.random.random(size=nnz)
-    return csr_matrix((vals, (rows, cols)), shape=(n, n))
+def generate_sparse_matrix(n, sparsity=0.9, seed=None, pattern="uniform", **options):
+    # Exactamente round((1 - sparsity) * n²) no nulos, sin duplicados; pattern
+    # y options (bandwidth, block_size, alpha) como en random_csr
+    return random_csr(n, n, density=1.0 - sparsity, pattern=pattern, seed=seed, **options)
+
+GEMM_MR, GEMM_NR = 4, 8
+GEMM_MC, GEMM_KC, GEMM_NC = 64, 256, 512
 
 try:
     from numba import njit, prange, set_num_threads, get_num_threads
@@ -102,38 +341,39 @@ except Exception:
     NUMBA_AVAILABLE = False
 
 if NUMBA_AVAILABLE:
+    # Los kernels acumulan sobre C (C += A @ B): el dtype de C fija el del
+    # acumulador, así que float32/int8 no pasan por float64 salvo que se pida.
     @njit(fastmath=True)
-    def _basic_numba(A, B):
-        n = A.shape[0]
-        C = np.zeros((n, n), dtype=np.float64)
-        for i in range(n):
+    def _basic_numba(A, B, C):
+        m, kdim = A.shape
+        n = B.shape[1]
+        for i in range(m):
             for j in range(n):
-                s = 0.0
-                for k in range(n):
+                s = C[i, j]
+                for k in range(kdim):
                     s += A[i, k] * B[k, j]
                 C[i, j] = s
-        return C
 
     @njit(parallel=True, fastmath=True)
-    def _parallel_numba(A, B):
-        n = A.shape[0]
-        C = np.zeros((n, n), dtype=np.float64)
-        for i in prange(n):
+    def _parallel_numba(A, B, C):
+        m, kdim = A.shape
+        n = B.shape[1]
+        for i in prange(m):
             for j in range(n):
-                s = 0.0
-                for k in range(n):
+                s = C[i, j]
+                for k in range(kdim):
                     s += A[i, k] * B[k, j]
                 C[i, j] = s
-        return C
 
     @njit(parallel=True, fastmath=True)
-    def _blocked_numba(A, B, block_size):
-        n = A.shape[0]
-        C = np.zeros((n, n), dtype=np.float64)
-        for ii in range(0, n, block_size):
-            iimax = min(ii + block_size, n)
-            for kk in range(0, n, block_size):
-                kkmax = min(kk + block_size, n)
+    def _blocked_numba_into(A, B, C, block_size):
+        # C += A @ B; A m×k, B k×n
+        m, kdim = A.shape
+        n = B.shape[1]
+        for ii in range(0, m, block_size):
+            iimax = min(ii + block_size, m)
+            for kk in range(0, kdim, block_size):
+                kkmax = min(kk + block_size, kdim)
                 for jj in range(0, n, block_size):
                     jjmax = min(jj + block_size, n)
                     for i in prange(ii, iimax):
@@ -141,34 +381,296 @@ if NUMBA_AVAILABLE:
                             aik = A[i, k]
                             for j in range(jj, jjmax):
                                 C[i, j] += aik * B[k, j]
-        return C
 
-def multiply_numba_basic(A, B, threads=None):
+    @njit(fastmath=True)
+    def _pack_a(A, i0, i1, p0, p1, Ap):
+        # Paneles de GEMM_MR filas, contiguos por k; el borde se rellena con 0
+        kc = p1 - p0
+        for ir in range(0, i1 - i0, GEMM_MR):
+            base = (ir // GEMM_MR) * kc * GEMM_MR
+            for p in range(kc):
+                for r in range(GEMM_MR):
+                    i = i0 + ir + r
+                    Ap[base + p * GEMM_MR + r] = A[i, p0 + p] if i < i1 else 0
+
+    @njit(fastmath=True)
+    def _pack_b(B, p0, p1, j0, j1, Bp):
+        # Paneles de GEMM_NR columnas, contiguos por k; el borde se rellena con 0
+        kc = p1 - p0
+        for jr in range(0, j1 - j0, GEMM_NR):
+            base = (jr // GEMM_NR) * kc * GEMM_NR
+            for p in range(kc):
+                for c in range(GEMM_NR):
+                    j = j0 + jr + c
+                    Bp[base + p * GEMM_NR + c] = B[p0 + p, j] if j < j1 else 0
+
+    @njit(fastmath=True)
+    def _micro_kernel(kc, Ap, a0, Bp, b0, C, i, j, mr, nr):
+        # Micro-kernel 4×GEMM_NR: cuatro filas de acumuladores que LLVM
+        # mantiene en registros vectoriales mientras se recorre k.
+        c0 = np.zeros(GEMM_NR, dtype=C.dtype)
+        c1 = np.zeros(GEMM_NR, dtype=C.dtype)
+        c2 = np.zeros(GEMM_NR, dtype=C.dtype)
+        c3 = np.zeros(GEMM_NR, dtype=C.dtype)
+        for p in range(kc):
+            a = a0 + p * GEMM_MR
+            b = b0 + p * GEMM_NR
+            a_0, a_1, a_2, a_3 = Ap[a], Ap[a + 1], Ap[a + 2], Ap[a + 3]
+            for c in range(GEMM_NR):
+                bc = Bp[b + c]
+                c0[c] += a_0 * bc
+                c1[c] += a_1 * bc
+                c2[c] += a_2 * bc
+                c3[c] += a_3 * bc
+        for c in range(nr):
+            C[i, j + c] += c0[c]
+            if mr > 1:
+                C[i + 1, j + c] += c1[c]
+            if mr > 2:
+                C[i + 2, j + c] += c2[c]
+            if mr > 3:
+                C[i + 3, j + c] += c3[c]
+
+    @njit(parallel=True, fastmath=True)
+    def _packed_numba_into(A, B, C, mc, kc, nc):
+        # C += A @ B estilo GotoBLAS: una sola región paralela sobre las
+        # macro-teselas mc×nc de C; cada hilo empaqueta sus paneles de A y B.
+        m, kdim = A.shape
+        n = B.shape[1]
+        n_ic = (m + mc - 1) // mc
+        n_jc = (n + nc - 1) // nc
+        for t in prange(n_ic * n_jc):
+            i0 = (t // n_jc) * mc
+            i1 = min(i0 + mc, m)
+            j0 = (t % n_jc) * nc
+            j1 = min(j0 + nc, n)
+            Ap = np.empty(((mc + GEMM_MR - 1) // GEMM_MR) * GEMM_MR * kc, dtype=C.dtype)
+            Bp = np.empty(((nc + GEMM_NR - 1) // GEMM_NR) * GEMM_NR * kc, dtype=C.dtype)
+            for p0 in range(0, kdim, kc):
+                p1 = min(p0 + kc, kdim)
+                kb = p1 - p0
+                _pack_a(A, i0, i1, p0, p1, Ap)
+                _pack_b(B, p0, p1, j0, j1, Bp)
+                for jr in range(0, j1 - j0, GEMM_NR):
+                    for ir in range(0, i1 - i0, GEMM_MR):
+                        _micro_kernel(kb, Ap, (ir // GEMM_MR) * kb * GEMM_MR,
+                                      Bp, (jr // GEMM_NR) * kb * GEMM_NR, C, i0 + ir, j0 + jr,
+                                      min(GEMM_MR, i1 - i0 - ir), min(GEMM_NR, j1 - j0 - jr))
+
+    @njit(fastmath=True)
+    def _axpy2(out, P, Q, sign):
+        # out = P + sign*Q (elemento a elemento; out puede ser P o Q)
+        for i in range(out.shape[0]):
+            for j in range(out.shape[1]):
+                out[i, j] = P[i, j] + sign * Q[i, j]
+
+    @njit(fastmath=True)
+    def _winograd_numba(A, B, C, arena, cutoff, block_size):
+        # C = A @ B con Strassen-Winograd (7 productos, 15 sumas). Los
+        # temporales X, Y, Z de cada nivel salen de `arena`, sin reservas.
+        # A, B, C y arena comparten dtype (se compila uno por dtype).
+        m, k = A.shape
+        n = B.shape[1]
+        if m <= cutoff or k <= cutoff or n <= cutoff:
+            C[:, :] = 0
+            _blocked_numba_into(A, B, C, block_size)
+            return
+        me, ke, ne = m - m % 2, k - k % 2, n - n % 2
+        if me != m or ke != k or ne != n:
+            _winograd_numba(A[:me, :ke], B[:ke, :ne], C[:me, :ne], arena, cutoff, block_size)
+            if ke != k:
+                for i in range(me):
+                    a = A[i, ke]
+                    for j in range(ne):
+                        C[i, j] += a * B[ke, j]
+            if ne != n:
+                for i in range(me):
+                    C[i, ne] = 0
+                    for p in range(k):
+                        C[i, ne] += A[i, p] * B[p, ne]
+            if me != m:
+                for j in range(n):
+                    C[me, j] = 0
+                    for p in range(k):
+                        C[me, j] += A[me, p] * B[p, j]
+            return
+
+        hm, hk, hn = m // 2, k // 2, n // 2
+        A11, A12, A21, A22 = A[:hm, :hk], A[:hm, hk:], A[hm:, :hk], A[hm:, hk:]
+        B11, B12, B21, B22 = B[:hk, :hn], B[:hk, hn:], B[hk:, :hn], B[hk:, hn:]
+        C11, C12, C21, C22 = C[:hm, :hn], C[:hm, hn:], C[hm:, :hn], C[hm:, hn:]
+        x_end = hm * hk
+        y_end = x_end + hk * hn
+        z_end = y_end + hm * hn
+        X = arena[:x_end].reshape((hm, hk))
+        Y = arena[x_end:y_end].reshape((hk, hn))
+        Z = arena[y_end:z_end].reshape((hm, hn))
+        rest = arena[z_end:]
+
+        _axpy2(X, A11, A21, -1)                                     # S3
+        _axpy2(Y, B22, B12, -1)                                     # T3
+        _winograd_numba(X, Y, C21, rest, cutoff, block_size)          # P7
+        _axpy2(X, A21, A22, 1)                                      # S1
+        _axpy2(Y, B12, B11, -1)                                     # T1
+        _winograd_numba(X, Y, C22, rest, cutoff, block_size)          # P5
+        _axpy2(X, X, A11, -1)                                       # S2
+        _axpy2(Y, B22, Y, -1)                                       # T2
+        _winograd_numba(X, Y, C12, rest, cutoff, block_size)          # P6
+        _axpy2(X, A12, X, -1)                                       # S4
+        _winograd_numba(X, B22, C11, rest, cutoff, block_size)        # P3
+        _winograd_numba(A11, B11, Z, rest, cutoff, block_size)        # P1
+        _axpy2(C12, Z, C12, 1)                                      # U2 = P1 + P6
+        _axpy2(C21, C12, C21, 1)                                    # U3 = U2 + P7
+        _axpy2(C12, C12, C22, 1)                                    # U4 = U2 + P5
+        _axpy2(C22, C21, C22, 1)                                    # U7 = U3 + P5
+        _axpy2(C12, C12, C11, 1)                                    # U5 = U4 + P3
+        _axpy2(Y, Y, B21, -1)                                       # T4
+        _winograd_numba(A22, Y, C11, rest, cutoff, block_size)        # P4
+        _axpy2(C21, C21, C11, -1)                                   # U6 = U3 - P4
+        _winograd_numba(A12, B21, C11, rest, cutoff, block_size)      # P2
+        _axpy2(C11, Z, C11, 1)                                      # U1 = P1 + P2
+
+    @njit(parallel=True, fastmath=True)
+    def _batched_numba(A, B, C):
+        # C[b] = A[b] @ B[b]; una pila de 1 se reutiliza en todo el lote.
+        # Un producto por iteración del prange: con matrices de 8..64 no
+        # compensa repartir filas entre hilos.
+        batch, m, n = C.shape
+        kdim = A.shape[2]
+        for b in prange(batch):
+            Ab = A[b % A.shape[0]]
+            Bb = B[b % B.shape[0]]
+            acc = np.empty(n, dtype=C.dtype)
+            for i in range(m):
+                acc[:] = 0
+                for p in range(kdim):
+                    a = Ab[i, p]
+                    for j in range(n):
+                        acc[j] += a * Bb[p, j]
+                C[b, i, :] = acc
+
+    @njit(parallel=True)
+    def _batched_dot_numba(A, B, C):
+        # float32/float64: un gemm de BLAS por producto, llamado desde código
+        # compilado (sin pasar por Python); gana al bucle escalar desde 16x16
+        for b in prange(C.shape[0]):
+            np.dot(A[b % A.shape[0]], B[b % B.shape[0]], C[b])
+
+def multiply_numba_basic(A, B, threads=None, accumulate=None):
     if not NUMBA_AVAILABLE:
         raise RuntimeError("Numba no disponible")
-    A = np.array(A, dtype=np.float64)
-    B = np.array(B, dtype=np.float64)
+    A = _as_matrix(A)
+    B = _as_matrix(B)
     if threads:
         set_num_threads(threads)
-    return _basic_numba(A, B)
+    C = np.zeros((A.shape[0], B.shape[1]), dtype=result_dtype(A, B, accumulate))
+    _basic_numba(A, B, C)
+    return C
 
-def multiply_numba_parallel(A, B, threads=None):
+def multiply_numba_parallel(A, B, threads=None, accumulate=None):
     if not NUMBA_AVAILABLE:
         raise RuntimeError("Numba no disponible")
-    A = np.array(A, dtype=np.float64)
-    B = np.array(B, dtype=np.float64)
+    A = _as_matrix(A)
+    B = _as_matrix(B)
     if threads:
         set_num_threads(threads)
-    return _parallel_numba(A, B)
+    C = np.zeros((A.shape[0], B.shape[1]), dtype=result_dtype(A, B, accumulate))
+    _parallel_numba(A, B, C)
+    return C
 
-def multiply_numba_blocked(A, B, block_size=64, threads=None):
+def multiply_numba_blocked(A, B, block_size=None, threads=None, accumulate=None):
     if not NUMBA_AVAILABLE:
         raise RuntimeError("Numba no disponible")
-    A = np.array(A, dtype=np.float64)
-    B = np.array(B, dtype=np.float64)
+    A = _as_matrix(A)
+    B = _as_matrix(B)
     if threads:
         set_num_threads(threads)
-    return _blocked_numba(A, B, block_size)
+    if block_size is None:
+        block_size = resolve_block_size("numba_blocked", A.shape[0], get_num_threads())
+    C = np.zeros((A.shape[0], B.shape[1]), dtype=result_dtype(A, B, accumulate))
+    _blocked_numba_into(A, B, C, block_size)
+    return C
+
+def multiply_numba_packed(A, B, threads=None, mc=GEMM_MC, kc=GEMM_KC, nc=GEMM_NC, accumulate=None):
+    if not NUMBA_AVAILABLE:
+        raise RuntimeError("Numba no disponible")
+    A = _as_matrix(A)
+    B = _as_matrix(B)
+    if threads:
+        set_num_threads(threads)
+    C = np.zeros((A.shape[0], B.shape[1]), dtype=result_dtype(A, B, accumulate))
+    _packed_numba_into(A, B, C, mc, kc, nc)
+    return C
+
+def winograd_arena_size(m, k, n, cutoff=STRASSEN_CUTOFF):
+    # Los subproblemas de un mismo nivel son secuenciales y del mismo tamaño:
+    # basta un juego X, Y, Z por nivel.
+    size = 0
+    while min(m, k, n) > cutoff:
+        m, k, n = m // 2, k // 2, n // 2
+        size += m * k + k * n + m * n
+    return size
+
+def multiply_numba_winograd(A, B, cutoff=STRASSEN_CUTOFF, block_size=None, threads=None,
+                            accumulate=None):
+    if not NUMBA_AVAILABLE:
+        raise RuntimeError("Numba no disponible")
+    A = _as_matrix(A)
+    B = _as_matrix(B)
+    # Las sumas previas de Strassen ya necesitan el dtype del acumulador
+    dtype = result_dtype(A, B, accumulate)
+    A = A.astype(dtype, copy=False)
+    B = B.astype(dtype, copy=False)
+    if threads:
+        set_num_threads(threads)
+    if block_size is None:
+        block_size = resolve_block_size("numba_blocked", cutoff, get_num_threads())
+    m, k = A.shape
+    n = B.shape[1]
+    C = np.empty((m, n), dtype=dtype)
+    arena = np.empty(max(1, winograd_arena_size(m, k, n, cutoff)), dtype=dtype)
+    _winograd_numba(A, B, C, arena, cutoff, block_size)
+    return C
+
+def _as_stack(A):
+    # Una matriz 2-D se trata como pila de 1 y se reutiliza en todo el lote
+    A = _as_matrix(A)
+    if A.ndim == 2:
+        A = A[np.newaxis]
+    if A.ndim != 3:
+        raise ValueError(f"se esperaba una pila (batch, filas, columnas), no {A.shape}")
+    return A
+
+def multiply_batched(A, B, method="numba", threads=None, accumulate=None, out=None):
+    # A: (batch, m, k), B: (batch, k, n) -> C: (batch, m, n) en una sola
+    # llamada: sin bucle Python por pareja ni set_num_threads por producto.
+    A = _as_stack(A)
+    B = _as_stack(B)
+    batch = max(A.shape[0], B.shape[0])
+    if A.shape[0] not in (1, batch) or B.shape[0] not in (1, batch):
+        raise ValueError(f"tamaños de lote incompatibles: {A.shape[0]} y {B.shape[0]}")
+    if A.shape[2] != B.shape[1]:
+        raise ValueError("dimensiones incompatibles: A es m×k y B debe ser k×n")
+    shape = (batch, A.shape[1], B.shape[2])
+    dtype = result_dtype(A, B, accumulate) if out is None else out.dtype
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    elif out.shape != shape:
+        raise ValueError(f"out debe tener forma {shape}, no {out.shape}")
+    if method == "numpy":
+        # matmul recorre el lote en C y llama a BLAS por producto, en un hilo
+        return np.matmul(A, B, out=out, dtype=dtype)
+    if method != "numba":
+        raise ValueError(f"método batched desconocido: {method}")
+    if not NUMBA_AVAILABLE:
+        raise RuntimeError("Numba no disponible")
+    if threads:
+        set_num_threads(threads)
+    if dtype in (np.float32, np.float64) and out.flags.c_contiguous:
+        _batched_dot_numba(np.ascontiguousarray(A, dtype=dtype), np.ascontiguousarray(B, dtype=dtype), out)
+    else:
+        _batched_numba(A, B, out)
+    return out
 
 def get_numba_threads():
     if NUMBA_AVAILABLE:
@@ -177,3 +679,136 @@ def get_numba_threads():
         except Exception:
             return None
     return None
+
+def reset_numba_threads():
+    # set_num_threads persiste en el proceso: se vuelve al valor de arranque
+    # (NUMBA_NUM_THREADS) para que un barrido no condicione al siguiente
+    if NUMBA_AVAILABLE:
+        from numba import config
+        set_num_threads(config.NUMBA_NUM_THREADS)
+
+# ---- GEMM: C = alpha * A @ B + beta * C sobre un C ya reservado ----
+# Con C y ws reutilizados entre llamadas (iteraciones de potencia, productos
+# repetidos) los backends no reservan memoria en cada paso.
+
+def _scale(C, factor):
+    if factor == 0:
+        C.fill(0)  # beta=0 ignora C aunque contenga NaN/basura
+    elif factor != 1:
+        np.multiply(C, factor, out=C, casting="unsafe")
+
+def _basic_gemm(A, B, C, ws, **_):
+    # Python puro, acumulando sobre C
+    m, k = A.shape
+    n = B.shape[1]
+    for i in range(m):
+        for j in range(n):
+            s = 0
+            for p in range(k):
+                s += A[i, p] * B[p, j]
+            C[i, j] += s
+
+def _numpy_gemm(A, B, C, ws, **_):
+    np.matmul(A, B, out=C, dtype=C.dtype)
+
+def _blocked_gemm(A, B, C, ws, block_size=None, **_):
+    if block_size is None:
+        block_size = resolve_block_size("blocked", A.shape[0])
+    _blocked_into(A, B, C, block_size, ws)
+
+def _strassen_gemm(A, B, C, ws, cutoff=STRASSEN_CUTOFF, **_):
+    if cutoff == "auto":
+        cutoff = _auto_cutoff(max(A.shape[0], A.shape[1], B.shape[1]))
+    _strassen_into(A, B, C, max(1, int(cutoff)), ws)
+
+def _numba_gemm(kernel):
+    def run(A, B, C, ws, threads=None, **options):
+        if not NUMBA_AVAILABLE:
+            raise RuntimeError("Numba no disponible")
+        if threads:
+            set_num_threads(threads)
+        kernel(A, B, C, **options)
+    return run
+
+def _numba_blocked_kernel(A, B, C, block_size=None):
+    if block_size is None:
+        block_size = resolve_block_size("numba_blocked", A.shape[0], get_num_threads())
+    _blocked_numba_into(A, B, C, block_size)
+
+def _numba_packed_kernel(A, B, C, mc=GEMM_MC, kc=GEMM_KC, nc=GEMM_NC):
+    _packed_numba_into(A, B, C, mc, kc, nc)
+
+def _winograd_gemm(A, B, C, ws, cutoff=STRASSEN_CUTOFF, block_size=None, threads=None, **_):
+    if not NUMBA_AVAILABLE:
+        raise RuntimeError("Numba no disponible")
+    if threads:
+        set_num_threads(threads)
+    if block_size is None:
+        block_size = resolve_block_size("numba_blocked", cutoff, get_num_threads())
+    m, k = A.shape
+    n = B.shape[1]
+    arena = _workspace(ws, "arena", 0, (max(1, winograd_arena_size(m, k, n, cutoff)),), C.dtype)
+    _winograd_numba(A, B, C, arena, cutoff, block_size)
+
+# nombre -> (kernel, acumula). Los que acumulan hacen C += A @ B; los demás
+# sobrescriben C y, con beta != 0, escriben en un buffer del workspace.
+# basic/Strassen/Winograd operan directamente en el dtype de C.
+GEMM_METHODS = {
+    "basic": (_basic_gemm, True),
+    "numpy": (_numpy_gemm, False),
+    "blocked": (_blocked_gemm, True),
+    "strassen": (_strassen_gemm, False),
+}
+if NUMBA_AVAILABLE:
+    GEMM_METHODS.update({
+        "numba_basic": (_numba_gemm(_basic_numba), True),
+        "numba_parallel": (_numba_gemm(_parallel_numba), True),
+        "numba_blocked": (_numba_gemm(_numba_blocked_kernel), True),
+        "numba_packed": (_numba_gemm(_numba_packed_kernel), True),
+        "winograd": (_winograd_gemm, False),
+    })
+
+def gemm(A, B, C=None, alpha=1, beta=0, method="numpy", ws=None, accumulate=None, **options):
+    # C = alpha * A @ B + beta * C, escrito en C. Sin C se reserva uno nuevo
+    # (dtype según accumulate); con C, su dtype manda. ws: dict de buffers
+    # que conviene reutilizar entre llamadas.
+    if method not in GEMM_METHODS:
+        raise ValueError(f"método gemm desconocido: {method}")
+    kernel, accumulates = GEMM_METHODS[method]
+    A = _as_matrix(A)
+    B = _as_matrix(B)
+    m, k = A.shape
+    if B.shape[0] != k:
+        raise ValueError("dimensiones incompatibles: A es m×k y B debe ser k×n")
+    if C is None:
+        C = np.zeros((m, B.shape[1]), dtype=result_dtype(A, B, accumulate))
+        beta = 0
+    elif C.shape != (m, B.shape[1]):
+        raise ValueError(f"C debe tener forma {(m, B.shape[1])}, no {C.shape}")
+    if ws is None:
+        ws = {}
+    if method in ("basic", "strassen", "winograd"):
+        A = A.astype(C.dtype, copy=False)
+        B = B.astype(C.dtype, copy=False)
+
+    if alpha == 0:
+        _scale(C, beta)
+    elif accumulates and (alpha == 1 or C.dtype.kind in "fc"):
+        # alpha*(A@B + (beta/alpha)*C): el kernel acumula sobre C escalado
+        _scale(C, beta / alpha)
+        kernel(A, B, C, ws, **options)
+        _scale(C, alpha)
+    elif beta == 0:
+        if accumulates:
+            C.fill(0)
+        kernel(A, B, C, ws, **options)
+        _scale(C, alpha)
+    else:
+        T = _workspace(ws, "gemm", 0, C.shape, C.dtype)
+        if accumulates:
+            T.fill(0)
+        kernel(A, B, T, ws, **options)
+        _scale(C, beta)
+        _scale(T, alpha)
+        C += T
+    return C
@@ -0,0 +1,116 @@
+import gc
+import os
+import threading
+import tracemalloc
+
+import psutil
+
+# Intervalo de muestreo del RSS durante la llamada
+SAMPLE_INTERVAL_S = 0.0005
+
+
+def _read_hwm_kb():
+    # VmHWM: pico de RSS del proceso según el kernel (solo Linux)
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_hwm():
+    # Escribir 5 en clear_refs reinicia VmHWM al RSS actual (Linux >= 4.0):
+    # así el pico del kernel es el de esta llamada, no el de todo el proceso
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class RSSSampler:
+    """Hilo que muestrea el RSS mientras dura el bloque with.
+
+    peak_kb es el máximo observado; los picos más cortos que el intervalo
+    pueden escaparse, por eso profile_memory lo combina con VmHWM.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL_S):
+        self.interval = interval
+        self.process = psutil.Process(os.getpid())
+        self.start_kb = 0.0
+        self.peak_kb = 0.0
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = self.process.memory_info().rss / 1024
+        self.peak_kb = max(self.peak_kb, rss)
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self.start_kb = self.peak_kb = self.process.memory_info().rss / 1024
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()  # el RSS justo al acabar (el resultado sigue vivo)
+
+    @property
+    def peak_delta_kb(self):
+        return self.peak_kb - self.start_kb
+
+
+def profile_memory(func, A, B, interval=SAMPLE_INTERVAL_S, trace=True):
+    # Una llamada instrumentada (fuera de las medidas de tiempo, porque
+    # tracemalloc y el hilo de muestreo la ralentizan). Devuelve los picos
+    # en KB respecto a la memoria de antes de la llamada:
+    #   rss_peak_delta_kb    máximo del RSS muestreado
+    #   hwm_peak_delta_kb    VmHWM reiniciado antes de la llamada (None si no hay)
+    #   traced_peak_delta_kb pico de tracemalloc: objetos de Python y buffers
+    #                        de NumPy, que informa de sus reservas a tracemalloc
+    #                        (no ve reservas nativas como los buffers de BLAS)
+    #   peak_delta_kb        el mayor de los anteriores
+    gc.collect()
+    started_tracing = trace and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        if trace:
+            traced_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        hwm = _reset_hwm()
+        hwm_before = _read_hwm_kb() if hwm else None
+        with RSSSampler(interval) as sampler:
+            result = func(A, B)
+        hwm_after = _read_hwm_kb() if hwm else None
+        traced_peak = tracemalloc.get_traced_memory()[1] - traced_before if trace else None
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+    del result
+
+    stats = {
+        "rss_before_kb": sampler.start_kb,
+        "rss_peak_delta_kb": sampler.peak_delta_kb,
+        "rss_samples": sampler.samples,
+        "hwm_peak_delta_kb": hwm_after - hwm_before if hwm_before is not None and hwm_after is not None else None,
+        "traced_peak_delta_kb": traced_peak / 1024 if traced_peak is not None else None,
+    }
+    stats["peak_delta_kb"] = max(v for k, v in stats.items()
+                                 if k.endswith("_delta_kb") and v is not None)
+    return stats
+
@@ -0,0 +1,239 @@
+import argparse
+import ctypes
+import fcntl
+import os
+import platform
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from autotune import CACHE_PATH, cpu_model, load_cache, save_cache
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except Exception:
+    NUMBA_AVAILABLE = False
+
+# Picos medidos del host (STREAM triad y DGEMM de NumPy), por CPU
+HOST_CACHE_PATH = os.path.join(os.path.dirname(CACHE_PATH), "host_peaks.json")
+STREAM_ELEMENTS = 1 << 24  # 128 MB por array float64, muy por encima de la LLC
+PEAK_GEMM_N = 2048
+CACHE_LINE = 64
+
+# ---- Contadores perf_event (Linux) ----
+
+_PERF_SYSCALL = {"x86_64": 298, "aarch64": 241}
+PERF_TYPE_HARDWARE, PERF_TYPE_SOFTWARE, PERF_TYPE_HW_CACHE = 0, 1, 3
+# nombre -> (tipo, config); llc_misses = lecturas de la LLC que fallan
+COUNTERS = {
+    "cycles": (PERF_TYPE_HARDWARE, 0),
+    "instructions": (PERF_TYPE_HARDWARE, 1),
+    "llc_misses": (PERF_TYPE_HW_CACHE, 2 | (0 << 8) | (1 << 16)),
+    "page_faults": (PERF_TYPE_SOFTWARE, 2),
+    "context_switches": (PERF_TYPE_SOFTWARE, 3),
+}
+_IOC_ENABLE, _IOC_DISABLE, _IOC_RESET = 0x2400, 0x2401, 0x2403
+
+
+class _PerfEventAttr(ctypes.Structure):
+    # perf_event_attr hasta config1 (PERF_ATTR_SIZE_VER0, 64 bytes)
+    _fields_ = [
+        ("type", ctypes.c_uint32),
+        ("size", ctypes.c_uint32),
+        ("config", ctypes.c_uint64),
+        ("sample_period", ctypes.c_uint64),
+        ("sample_type", ctypes.c_uint64),
+        ("read_format", ctypes.c_uint64),
+        ("flags", ctypes.c_uint64),
+        ("wakeup_events", ctypes.c_uint32),
+        ("bp_type", ctypes.c_uint32),
+        ("config1", ctypes.c_uint64),
+    ]
+
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def _perf_open(kind, config, tid):
+    nr = _PERF_SYSCALL.get(platform.machine())
+    if nr is None:
+        return None
+    attr = _PerfEventAttr(type=kind, size=ctypes.sizeof(_PerfEventAttr), config=config)
+    # disabled | inherit | exclude_kernel | exclude_hv: solo espacio de
+    # usuario, lo que permite perf_event_paranoid=2 sin privilegios
+    attr.flags = 1 | (1 << 1) | (1 << 5) | (1 << 6)
+    fd = _libc.syscall(nr, ctypes.byref(attr), tid, -1, -1, 0)
+    return fd if fd >= 0 else None
+
+
+class PerfCounters:
+    """Cuenta eventos perf de todos los hilos del proceso dentro del with.
+
+    Se abre un contador por hilo existente (los pools de BLAS y Numba ya
+    están creados tras el calentamiento) con inherit para los que nazcan
+    después. values[nombre] es None si el evento no está disponible (sin
+    PMU en una VM, perf_event_paranoid alto, otro sistema operativo).
+    """
+
+    def __init__(self, events=tuple(COUNTERS)):
+        self.events = events
+        self.values = {}
+        self._fds = {}
+
+    def __enter__(self):
+        try:
+            tids = [int(t) for t in os.listdir("/proc/self/task")]
+        except OSError:
+            tids = []
+        for name in self.events:
+            fds = [fd for fd in (_perf_open(*COUNTERS[name], tid) for tid in tids) if fd is not None]
+            self._fds[name] = fds
+            for fd in fds:
+                fcntl.ioctl(fd, _IOC_RESET, 0)
+                fcntl.ioctl(fd, _IOC_ENABLE, 0)
+        return self
+
+    def __exit__(self, *exc):
+        for name, fds in self._fds.items():
+            total = 0
+            for fd in fds:
+                fcntl.ioctl(fd, _IOC_DISABLE, 0)
+                total += int.from_bytes(os.read(fd, 8), "little")
+                os.close(fd)
+            self.values[name] = total if fds else None
+        self._fds = {}
+
+
+def perf_available(event="cycles"):
+    fd = _perf_open(*COUNTERS[event], 0)
+    if fd is None:
+        return False
+    os.close(fd)
+    return True
+
+
+def count_events(func, A, B):
+    # Una llamada con contadores; IPC si hay ciclos e instrucciones
+    with PerfCounters() as pc:
+        func(A, B)
+    values = dict(pc.values)
+    cycles, instructions = values.get("cycles"), values.get("instructions")
+    values["ipc"] = instructions / cycles if cycles and instructions is not None else None
+    return values
+
+
+# ---- Picos del host ----
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True)
+    def _triad(a, b, c, s):
+        for i in prange(a.shape[0]):
+            a[i] = b[i] + s * c[i]
+
+
+def stream_bandwidth(elements=STREAM_ELEMENTS, repeats=5):
+    # STREAM triad a = b + s·c; cuenta 3 × 8 bytes por elemento como STREAM
+    # (sin la lectura extra de write-allocate). Sin Numba, NumPy hace dos
+    # pasadas (5 accesos por elemento) y así se cuentan.
+    a = np.zeros(elements)
+    b = np.full(elements, 1.0)
+    c = np.full(elements, 2.0)
+    if NUMBA_AVAILABLE:
+        step, touched = (lambda: _triad(a, b, c, 3.0)), 3
+    else:
+        def step():
+            np.multiply(c, 3.0, out=a)
+            np.add(a, b, out=a)
+        touched = 5
+    step()
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        step()
+        best = min(best, time.perf_counter() - start)
+    return touched * a.nbytes / best / 1e9
+
+
+def peak_gflops(n=PEAK_GEMM_N, repeats=3):
+    # Techo de cómputo práctico: DGEMM de la BLAS de NumPy con sus hilos
+    A = np.random.default_rng(0).random((n, n))
+    B = np.random.default_rng(1).random((n, n))
+    C = np.empty((n, n))
+    np.matmul(A, B, out=C)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        np.matmul(A, B, out=C)
+        best = min(best, time.perf_counter() - start)
+    return 2.0 * n ** 3 / best / 1e9
+
+
+def host_peaks(refresh=False, path=HOST_CACHE_PATH):
+    # Se mide una vez por CPU y número de núcleos y se guarda como autotune
+    cache = load_cache(path)
+    key = f"{cpu_model()}|cpus={os.cpu_count()}"
+    if refresh or key not in cache:
+        cache[key] = {
+            "stream_gbs": stream_bandwidth(),
+            "peak_gflops": peak_gflops(),
+            "measured": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        save_cache(cache, path)
+    return cache[key]
+
+
+# ---- Modelo de trabajo por fila ----
+
+def work_model(A, B, n, itemsize, sparse=False):
+    # (flops, bytes): 2·m·k·n flops para densas (convención también para
+    # Strassen/Winograd, que hacen menos pero se comparan en el mismo eje);
+    # bytes = tráfico obligatorio, leer A y B y escribir C una vez. En
+    # dispersas, 2 flops por producto escalar y solo la lectura de A y B.
+    if sparse:
+        flops = 2 * int(np.diff(B.indptr)[A.indices].sum())
+        nbytes = sum(M.data.nbytes + M.indices.nbytes + M.indptr.nbytes for M in (A, B))
+        return flops, nbytes
+    return 2 * n ** 3, 3 * n * n * itemsize
+
+
+def roofline_point(gflops, intensity, peaks):
+    # Techo alcanzable min(pico, AI × ancho de banda) y qué lo limita
+    memory_roof = intensity * peaks["stream_gbs"]
+    attainable = min(peaks["peak_gflops"], memory_roof)
+    return {
+        "attainable_gflops": attainable,
+        "bound": "memoria" if memory_roof < peaks["peak_gflops"] else "cómputo",
+        "pct_of_roof": 100.0 * gflops / attainable if attainable > 0 else None,
+    }
+
+
+def print_roofline(rows, peaks):
+    # rows: filas del almacén del harness (con GFLOPS y ArithIntensity)
+    ridge = peaks["peak_gflops"] / peaks["stream_gbs"]
+    print(f"Pico DGEMM {peaks['peak_gflops']:.1f} GFLOP/s, STREAM {peaks['stream_gbs']:.1f} GB/s, "
+          f"punto de equilibrio AI = {ridge:.2f} flop/byte")
+    for row in rows:
+        if not row.get("GFLOPS"):
+            continue
+        gflops, intensity = float(row["GFLOPS"]), float(row["ArithIntensity"])
+        point = roofline_point(gflops, intensity, peaks)
+        threads = f" t={row['Threads']}" if row.get("Threads") else ""
+        ipc = f"  IPC {float(row['IPC']):.2f}" if row.get("IPC") else ""
+        print(f" {row['Kernel'] + ' n=' + row['Size'] + threads:32s} {gflops:9.2f} GFLOP/s  AI {intensity:7.2f}  "
+              f"techo {point['attainable_gflops']:8.1f} ({point['bound']})  {point['pct_of_roof']:5.1f}%{ipc}")
+
+
+if __name__ == "__main__":
+    from harness import ResultStore, STORE_DIR
+
+    parser = argparse.ArgumentParser(description="Resumen roofline de una ejecución del harness")
+    parser.add_argument("run_id", nargs="?", help="RunID (por defecto la última)")
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--refresh", action="store_true", help="vuelve a medir STREAM y el pico DGEMM")
+    args = parser.parse_args()
+    store = ResultStore(args.store)
+    peaks = host_peaks(args.refresh)
+    print(f"Contadores perf de hardware: {'sí' if perf_available() else 'no disponibles'}")
+    print_roofline(store.results(args.run_id or store.latest_run()), peaks)
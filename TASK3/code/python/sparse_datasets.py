@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+from scipy.io import loadmat, mmread
+from scipy.sparse import csr_matrix, issparse
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+# Dónde se buscan los ficheros por nombre (mc2depi -> mc2depi.mat, ...).
+# MATRIX_DATA_DIR admite varias rutas separadas por os.pathsep.
+DATA_DIRS = [d for d in os.environ.get("MATRIX_DATA_DIR", "").split(os.pathsep) if d] + [
+    os.path.normpath(os.path.join(_HERE, "..", "..")),
+    os.path.normpath(os.path.join(_HERE, "..", "..", "..")),
+]
+CACHE_DIR = os.environ.get(
+    "MATRIX_CSR_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "matrix_benchmark", "csr"),
+)
+EXTENSIONS = (".mat", ".mtx", ".mtx.gz")
+_ARRAYS = ("indptr", "indices", "data")
+
+
+def _stem(path):
+    name = os.path.basename(path)
+    for ext in EXTENSIONS:
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return os.path.splitext(name)[0]
+
+
+def find_matrix(name, dirs=None):
+    # Ruta existente tal cual; si no, nombre (con o sin extensión) en DATA_DIRS.
+    # None si no aparece: puede quedar la caché de una conversión anterior.
+    if os.path.isfile(name):
+        return os.path.abspath(name)
+    candidates = [name] if name.endswith(EXTENSIONS) else [name + ext for ext in EXTENSIONS]
+    for d in dirs or DATA_DIRS:
+        for c in candidates:
+            path = os.path.join(d, c)
+            if os.path.isfile(path):
+                return os.path.abspath(path)
+    return None
+
+
+def read_matrix(path):
+    # Lectura lenta del original (.mat de SuiteSparse o MatrixMarket)
+    if path.endswith(".mat"):
+        mat_data = loadmat(path, struct_as_record=False, squeeze_me=True)
+        if "Problem" in mat_data:
+            problem_struct = mat_data["Problem"]
+            if not hasattr(problem_struct, "A"):
+                raise ValueError(f"El struct 'Problem' de {path} no contiene campo 'A'")
+            A = problem_struct.A
+        else:
+            sparse = [v for k, v in mat_data.items() if not k.startswith("__") and issparse(v)]
+            if len(sparse) != 1:
+                raise ValueError(f"No se encontró 'Problem' ni una única matriz dispersa en {path}")
+            A = sparse[0]
+    else:
+        A = mmread(path)
+    A = csr_matrix(A)
+    A.sum_duplicates()  # deja el formato canónico (índices ordenados)
+    return A
+
+
+def _source_info(path):
+    st = os.stat(path)
+    return {"source": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _read_meta(entry):
+    try:
+        with open(os.path.join(entry, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(A, entry, info):
+    # Se escribe en un directorio temporal y se renombra: una caché a medias
+    # (proceso interrumpido) nunca se da por buena.
+    tmp = f"{entry}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name in _ARRAYS:
+        np.save(os.path.join(tmp, name + ".npy"), getattr(A, name))
+    meta = dict(info or {}, shape=list(A.shape), nnz=int(A.nnz), dtype=A.dtype.str)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+
+
+def _open_cache(entry, meta, mmap):
+    mode = "r" if mmap else None
+    indptr, indices, data = (np.load(os.path.join(entry, name + ".npy"), mmap_mode=mode) for name in _ARRAYS)
+    # Los arrays ya tienen tipos válidos: csr_matrix los usa sin copiar
+    A = csr_matrix((data, indices, indptr), shape=tuple(meta["shape"]), copy=False)
+    A.has_sorted_indices = True
+    A.has_canonical_format = True
+    return A
+
+
+def load_matrix(name, cache_dir=CACHE_DIR, mmap=True, refresh=False):
+    # Devuelve (CSR, stats). La primera vez convierte el original y guarda
+    # indptr/indices/data como .npy; después solo se abren (memmap si mmap).
+    # La caché se rehace si el original cambia de tamaño o de fecha.
+    path = find_matrix(name)
+    entry = os.path.join(cache_dir, _stem(path or name))
+    meta = _read_meta(entry)
+    info = _source_info(path) if path else None
+    stale = meta is None or (info is not None and any(meta.get(k) != v for k, v in info.items()))
+
+    start = time.perf_counter()
+    if refresh or stale:
+        if path is None:
+            raise FileNotFoundError(f"No se encontró {name} (buscado en {', '.join(DATA_DIRS)}) ni su caché en {entry}")
+        A = read_matrix(path)
+        convert_s = time.perf_counter() - start
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_cache(A, entry, info)
+        meta = _read_meta(entry)
+        cached = False
+    else:
+        convert_s = 0.0
+        cached = True
+    load_start = time.perf_counter()
+    A = _open_cache(entry, meta, mmap)
+    stats = {
+        "name": _stem(path or name),
+        "source": path,
+        "cache": entry,
+        "cached": cached,
+        "convert_s": convert_s,
+        "load_s": time.perf_counter() - load_start,
+        "shape": A.shape,
+        "nnz": A.nnz,
+    }
+    return A, stats
+
+
+def load_matrices(names, cache_dir=CACHE_DIR, mmap=True):
+    # Lista de matrices para el benchmark: [(nombre, CSR)]. Las que no se
+    # encuentran se informan y se omiten, sin cortar el resto.
+    loaded = []
+    for name in names:
+        try:
+            A, stats = load_matrix(name, cache_dir, mmap)
+        except Exception as e:
+            print(f"No se pudo cargar {name}:", e)
+            continue
+        origin = "caché" if stats["cached"] else f"convertida en {stats['convert_s']:.2f} s"
+        print(f"{stats['name']}: {A.shape[0]}x{A.shape[1]}, nnz={A.nnz} ({origin}, {stats['load_s'] * 1e3:.1f} ms)")
+        loaded.append((stats["name"], A))
+    return loaded
+
+
+if __name__ == "__main__":
+    # python sparse_datasets.py mc2depi otra.mtx ... : convierte y deja en caché
+    for name in sys.argv[1:] or ["mc2depi"]:
+        try:
+            A, stats = load_matrix(name, refresh=True)
+            print(f"{stats['name']}: {A.shape}, nnz={A.nnz}, {stats['convert_s']:.2f} s -> {stats['cache']}")
+        except Exception as e:
+            print(f"{name} error:", e)
+    print(f"Caché: {CACHE_DIR}")
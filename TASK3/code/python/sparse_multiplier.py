@@ -0,0 +1,480 @@
+import hashlib
+
+import numpy as np
+from scipy.sparse import csr_matrix, bsr_matrix, issparse
+
+try:
+    from numba import njit, prange, set_num_threads, get_num_threads
+    NUMBA_AVAILABLE = True
+except Exception:
+    NUMBA_AVAILABLE = False
+
+# Trozos de filas por hilo: más de uno para repartir filas de coste desigual
+CHUNKS_PER_THREAD = 4
+# SpMM: por encima de esta densidad conviene BLAS denso; BSR si los bloques
+# BSR_BLOCK guardados están al menos así de llenos.
+SPMM_DENSE_DENSITY = 0.25
+SPMM_BSR_FILL = 0.5
+BSR_BLOCK = (4, 4)
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True)
+    def _spgemm_symbolic(a_ptr, a_idx, b_ptr, b_idx, n_cols, chunks):
+        # Pasada simbólica: nnz de cada fila de C, sin calcular valores.
+        # Cada trozo de filas tiene su propio marcador de columnas.
+        row_nnz = np.zeros(a_ptr.shape[0] - 1, dtype=np.int64)
+        for c in prange(chunks.shape[0] - 1):
+            mark = np.full(n_cols, -1, dtype=np.int64)
+            for i in range(chunks[c], chunks[c + 1]):
+                count = 0
+                for jj in range(a_ptr[i], a_ptr[i + 1]):
+                    k = a_idx[jj]
+                    for kk in range(b_ptr[k], b_ptr[k + 1]):
+                        col = b_idx[kk]
+                        if mark[col] != i:
+                            mark[col] = i
+                            count += 1
+                row_nnz[i] = count
+        return row_nnz
+
+    @njit(parallel=True, fastmath=True)
+    def _spgemm_numeric(a_ptr, a_idx, a_val, b_ptr, b_idx, b_val, n_cols, chunks,
+                        c_ptr, c_idx, c_val, sort_indices):
+        # Pasada numérica (Gustavson): acumulador denso por trozo de filas;
+        # cada fila escribe en su hueco de c_idx/c_val, ya dimensionado.
+        for c in prange(chunks.shape[0] - 1):
+            acc = np.zeros(n_cols, dtype=c_val.dtype)
+            mark = np.full(n_cols, -1, dtype=np.int64)
+            for i in range(chunks[c], chunks[c + 1]):
+                start = c_ptr[i]
+                pos = start
+                for jj in range(a_ptr[i], a_ptr[i + 1]):
+                    k = a_idx[jj]
+                    a = a_val[jj]
+                    for kk in range(b_ptr[k], b_ptr[k + 1]):
+                        col = b_idx[kk]
+                        if mark[col] != i:
+                            mark[col] = i
+                            c_idx[pos] = col
+                            pos += 1
+                        acc[col] += a * b_val[kk]
+                if sort_indices:
+                    c_idx[start:pos].sort()
+                for p in range(start, pos):
+                    col = c_idx[p]
+                    c_val[p] = acc[col]
+                    acc[col] = 0
+
+    @njit(parallel=True, fastmath=True)
+    def _spgemm_numeric_planned(a_ptr, a_idx, a_val, b_ptr, b_idx, b_val, n_cols, chunks,
+                                c_ptr, c_idx, c_val):
+        # Pasada numérica con el patrón de C ya conocido: pos[col] da el hueco
+        # de cada columna en la fila, sin marcador ni escritura de índices.
+        for c in prange(chunks.shape[0] - 1):
+            pos = np.empty(n_cols, dtype=np.int64)
+            for i in range(chunks[c], chunks[c + 1]):
+                for p in range(c_ptr[i], c_ptr[i + 1]):
+                    pos[c_idx[p]] = p
+                    c_val[p] = 0
+                for jj in range(a_ptr[i], a_ptr[i + 1]):
+                    k = a_idx[jj]
+                    a = a_val[jj]
+                    for kk in range(b_ptr[k], b_ptr[k + 1]):
+                        c_val[pos[b_idx[kk]]] += a * b_val[kk]
+
+
+    @njit(parallel=True, fastmath=True)
+    def _spmm_csr(ptr, idx, val, X, Y):
+        # Y += A @ X, una fila de A por iteración: la fila X[k, :] es
+        # contigua y el bucle interno recorre todo el ancho denso.
+        for i in prange(Y.shape[0]):
+            for jj in range(ptr[i], ptr[i + 1]):
+                a = val[jj]
+                k = idx[jj]
+                for c in range(X.shape[1]):
+                    Y[i, c] += a * X[k, c]
+
+    @njit(parallel=True, fastmath=True)
+    def _spmm_bsr(ptr, idx, blocks, X, Y):
+        # Igual que CSR pero por filas de bloques R×C densos: un índice por
+        # bloque en lugar de uno por valor.
+        R, Cb = blocks.shape[1], blocks.shape[2]
+        for bi in prange(ptr.shape[0] - 1):
+            for jj in range(ptr[bi], ptr[bi + 1]):
+                k0 = idx[jj] * Cb
+                for r in range(R):
+                    i = bi * R + r
+                    for c in range(Cb):
+                        a = blocks[jj, r, c]
+                        for w in range(X.shape[1]):
+                            Y[i, w] += a * X[k0 + c, w]
+
+
+    @njit
+    def _count_blocks(ptr, idx, R, Cb, n_block_cols):
+        # Bloques R×Cb distintos que tocan los no nulos de una CSR, en O(nnz)
+        mark = np.full(n_block_cols, -1, dtype=np.int64)
+        count = 0
+        for i in range(ptr.shape[0] - 1):
+            bi = i // R
+            for jj in range(ptr[i], ptr[i + 1]):
+                bj = idx[jj] // Cb
+                if mark[bj] != bi:
+                    mark[bj] = bi
+                    count += 1
+        return count
+
+
+def row_chunks(indptr, weights, parts):
+    # Límites de filas [r0, r1) con un coste (weights) parecido por trozo
+    m = indptr.shape[0] - 1
+    cum = np.concatenate(([0], np.cumsum(weights)))
+    targets = np.linspace(0, cum[-1], parts + 1)[1:-1]
+    bounds = np.searchsorted(cum, targets, side="left")
+    return np.unique(np.concatenate(([0], bounds, [m]))).astype(np.int64)
+
+
+def _spgemm_chunks(A, B, threads):
+    # Coste de la fila i de C = suma de las longitudes de las filas de B que toca
+    b_len = np.diff(B.indptr)
+    cum = np.concatenate(([0], np.cumsum(b_len[A.indices], dtype=np.int64)))
+    row_flops = cum[A.indptr[1:]] - cum[A.indptr[:-1]]
+    return row_chunks(A.indptr, row_flops, max(1, threads * CHUNKS_PER_THREAD))
+
+
+def _spgemm_operands(A, B, threads):
+    if not NUMBA_AVAILABLE:
+        raise RuntimeError("Numba no disponible")
+    A = csr_matrix(A)
+    B = csr_matrix(B)
+    if A.shape[1] != B.shape[0]:
+        raise ValueError("dimensiones incompatibles: A es m×k y B debe ser k×n")
+    if threads:
+        set_num_threads(threads)
+    return A, B
+
+
+def _spgemm_full(A, B, sort_indices):
+    # Pasadas simbólica y numérica -> (c_ptr, c_idx, c_val, chunks)
+    m, n = A.shape[0], B.shape[1]
+    dtype = np.result_type(A.dtype, B.dtype)
+    chunks = _spgemm_chunks(A, B, get_num_threads())
+
+    a_ptr, a_idx = A.indptr, A.indices
+    b_ptr, b_idx = B.indptr, B.indices
+    row_nnz = _spgemm_symbolic(a_ptr, a_idx, b_ptr, b_idx, n, chunks)
+    c_ptr = np.zeros(m + 1, dtype=np.int64)
+    np.cumsum(row_nnz, out=c_ptr[1:])
+    c_idx = np.empty(c_ptr[-1], dtype=np.int64)
+    c_val = np.empty(c_ptr[-1], dtype=dtype)
+    _spgemm_numeric(a_ptr, a_idx, A.data.astype(dtype, copy=False),
+                    b_ptr, b_idx, B.data.astype(dtype, copy=False), n, chunks,
+                    c_ptr, c_idx, c_val, sort_indices)
+    return c_ptr, c_idx, c_val, chunks
+
+
+def spgemm(A, B, threads=None, sort_indices=False, reuse=False):
+    # C = A @ B con A, B dispersas -> CSR. Como en SciPy, las columnas de
+    # cada fila quedan en orden de aparición salvo sort_indices=True (ordenar
+    # cuesta más que la pasada numérica en filas de ~100 nnz). Las
+    # cancelaciones exactas se guardan como ceros explícitos.
+    # reuse=True: el patrón de C sale de la caché de planes (ver plan_spgemm)
+    # y solo se hace la pasada numérica; el coste extra es la huella O(nnz).
+    if reuse:
+        return plan_spgemm(A, B, threads, sort_indices).execute(A, B)
+    A, B = _spgemm_operands(A, B, threads)
+    c_ptr, c_idx, c_val, _ = _spgemm_full(A, B, sort_indices)
+    C = csr_matrix((c_val, c_idx, c_ptr), shape=(A.shape[0], B.shape[1]))
+    if sort_indices:
+        C.has_sorted_indices = True
+    return C
+
+
+# ---- Plan/ejecución: patrón de C reutilizable cuando solo cambian los valores ----
+
+# Planes guardados por huella del patrón; se descarta el más antiguo
+PLAN_CACHE_SIZE = 8
+_plans = {}
+
+
+def pattern_fingerprint(*matrices):
+    # Huella de forma + indptr + indices (no de los valores) de cada CSR
+    h = hashlib.blake2b(digest_size=16)
+    for M in matrices:
+        h.update(np.asarray(M.shape, dtype=np.int64).tobytes())
+        h.update(np.ascontiguousarray(M.indptr, dtype=np.int64).tobytes())
+        h.update(np.ascontiguousarray(M.indices).tobytes())
+    return h.hexdigest()
+
+
+def _owner(a):
+    # Array dueño de la memoria (las vistas de NumPy apuntan a él en .base)
+    while isinstance(a.base, np.ndarray):
+        a = a.base
+    return a
+
+
+def _same_owner(a, b):
+    # Por identidad y no por solapamiento: con nnz == 0 los índices tienen
+    # tamaño cero y np.may_share_memory siempre da False
+    return _owner(a) is _owner(b)
+
+
+class SpGEMMPlan:
+    """Patrón de C = A @ B calculado una vez (pasada simbólica incluida).
+
+    execute() solo hace la pasada numérica con los valores actuales de A y B,
+    que deben tener el mismo patrón que al planificar.
+    """
+
+    def __init__(self, A, B, sort_indices=False, key=None):
+        self.key = key
+        self.shape = (A.shape[0], B.shape[1])
+        self.dtype = np.result_type(A.dtype, B.dtype)
+        self.threads = get_num_threads()
+        self._a_shape, self._a_nnz = A.shape, A.nnz
+        self._b_shape, self._b_nnz = B.shape, B.nnz
+        # Se guardan los índices de A y B: execute no se fía de los de la
+        # llamada y así solo lee de ellas los valores
+        self._a_ptr, self._a_idx = A.indptr.copy(), A.indices.copy()
+        self._b_ptr, self._b_idx = B.indptr.copy(), B.indices.copy()
+        c_ptr, c_idx, c_val, self.chunks = _spgemm_full(A, B, sort_indices)
+        # SciPy reduce los índices a int32 si caben: se guardan ya convertidos
+        # para que las salidas de empty() los compartan (vistas, sin copia)
+        C = csr_matrix((c_val, c_idx, c_ptr), shape=self.shape)
+        self.indptr, self.indices = C.indptr, C.indices
+        self.sorted_indices = sort_indices
+
+    @property
+    def nnz(self):
+        return int(self.indptr[-1])
+
+    def empty(self, dtype=None):
+        # CSR de salida con el patrón de C; comparte indptr/indices con el plan
+        data = np.empty(self.nnz, dtype=dtype or self.dtype)
+        C = csr_matrix((data, self.indices, self.indptr), shape=self.shape, copy=False)
+        C.has_sorted_indices = self.sorted_indices
+        return C
+
+    def execute(self, A, B, out=None):
+        # C = A @ B en out (CSR de empty()) o en una CSR nueva
+        A = A if A.format == "csr" else csr_matrix(A)
+        B = B if B.format == "csr" else csr_matrix(B)
+        if (A.shape, A.nnz, B.shape, B.nnz) != (self._a_shape, self._a_nnz, self._b_shape, self._b_nnz):
+            raise ValueError("A y B no tienen el patrón con el que se planificó")
+        if out is None:
+            out = self.empty()
+        elif not (_same_owner(out.indices, self.indices) and _same_owner(out.indptr, self.indptr)):
+            raise ValueError("out debe venir de empty() de este plan")
+        if get_num_threads() != self.threads:
+            set_num_threads(self.threads)  # los trozos de filas son para estos hilos
+        _spgemm_numeric_planned(self._a_ptr, self._a_idx, A.data.astype(out.dtype, copy=False),
+                                self._b_ptr, self._b_idx, B.data.astype(out.dtype, copy=False),
+                                self.shape[1], self.chunks, self.indptr, self.indices, out.data)
+        return out
+
+
+def plan_spgemm(A, B, threads=None, sort_indices=False, cache=True):
+    # Plan para A @ B; con cache=True se reutiliza el de una llamada anterior
+    # con el mismo patrón (huella de A y B), hilos y orden de índices.
+    A, B = _spgemm_operands(A, B, threads)
+    if not cache:
+        return SpGEMMPlan(A, B, sort_indices)
+    key = (pattern_fingerprint(A, B), get_num_threads(), sort_indices)
+    plan = _plans.pop(key, None)
+    if plan is None:
+        plan = SpGEMMPlan(A, B, sort_indices, key)
+        while len(_plans) >= PLAN_CACHE_SIZE:
+            _plans.pop(next(iter(_plans)))
+    _plans[key] = plan  # al final: el más reciente
+    return plan
+
+
+def clear_plans():
+    _plans.clear()
+
+
+def block_fill(A, blocksize=BSR_BLOCK):
+    # Fracción de valores no nulos dentro de los bloques que habría que
+    # guardar en BSR (1.0 = bloques totalmente llenos)
+    R, Cb = blocksize
+    if isinstance(A, bsr_matrix) and A.blocksize == blocksize:
+        return np.count_nonzero(A.data) / max(1, A.data.size)
+    A = csr_matrix(A)
+    blocks = _count_blocks(A.indptr, A.indices, R, Cb, -(-A.shape[1] // Cb))
+    return A.nnz / max(1, blocks * R * Cb)
+
+
+def _fits_blocks(A, blocksize):
+    return A.shape[0] % blocksize[0] == 0 and A.shape[1] % blocksize[1] == 0
+
+
+def choose_spmm_format(A, blocksize=BSR_BLOCK):
+    # "dense" si A está casi llena, "bsr" si sus no nulos forman bloques,
+    # "csr" en otro caso. BSR exige dimensiones múltiplo del bloque.
+    m, k = A.shape
+    # En BSR, nnz cuenta también los ceros guardados dentro de los bloques
+    nnz = A.count_nonzero() if A.format == "bsr" else A.nnz
+    if nnz >= SPMM_DENSE_DENSITY * m * k:
+        return "dense"
+    if _fits_blocks(A, blocksize) and block_fill(A, blocksize) >= SPMM_BSR_FILL:
+        return "bsr"
+    return "csr"
+
+
+def spmm(A, X, threads=None, format="auto", blocksize=BSR_BLOCK):
+    # Y = A @ X con A dispersa (CSR/CSC/BSR/COO) y X densa (k×w o vector).
+    # format="auto" elige representación según la densidad de A; la
+    # conversión, si hace falta, entra en el tiempo medido.
+    if not NUMBA_AVAILABLE:
+        raise RuntimeError("Numba no disponible")
+    if not issparse(A):
+        raise ValueError("A debe ser una matriz dispersa de SciPy")
+    X = np.asarray(X)
+    vector = X.ndim == 1
+    X = np.ascontiguousarray(X.reshape(X.shape[0], -1))
+    if A.shape[1] != X.shape[0]:
+        raise ValueError("dimensiones incompatibles: A es m×k y X debe ser k×w")
+    if format == "auto":
+        format = choose_spmm_format(A, blocksize)
+    if threads:
+        set_num_threads(threads)
+    dtype = np.result_type(A.dtype, X.dtype)
+
+    if format == "dense":
+        Y = A.toarray() @ X
+    elif format == "bsr":
+        if not _fits_blocks(A, blocksize):
+            raise ValueError(f"BSR necesita dimensiones múltiplo del bloque {blocksize}")
+        A = A.tobsr(blocksize=blocksize) if A.format != "bsr" or A.blocksize != blocksize else A
+        Y = np.zeros((A.shape[0], X.shape[1]), dtype=dtype)
+        _spmm_bsr(A.indptr, A.indices, A.data, X, Y)
+    elif format == "csr":
+        A = A.tocsr()
+        Y = np.zeros((A.shape[0], X.shape[1]), dtype=dtype)
+        _spmm_csr(A.indptr, A.indices, A.data, X, Y)
+    else:
+        raise ValueError(f"formato SpMM desconocido: {format}")
+    return Y.ravel() if vector else Y
+
+
+# ---- Generación de matrices dispersas con nnz exacto ----
+
+SPARSE_PATTERNS = ("uniform", "banded", "powerlaw", "block_diagonal")
+
+
+def _split_degrees(total, weights, caps, rng):
+    # Reparte exactamente `total` no nulos entre filas según `weights`, sin
+    # pasar de caps[i]; lo que sobra de una fila llena va a las demás.
+    degrees = rng.multinomial(total, weights / weights.sum())
+    while True:
+        over = np.maximum(degrees - caps, 0)
+        extra = int(over.sum())
+        if extra == 0:
+            return degrees
+        degrees -= over
+        room = caps - degrees
+        degrees += rng.multinomial(extra, room / room.sum())
+
+
+def _sample_windows(nnz, lo, width, rng):
+    # nnz celdas distintas, uniformes entre las permitidas: la fila i admite
+    # las columnas [lo[i], lo[i] + width[i]). Se numeran todas las celdas
+    # permitidas y se eligen nnz números sin reemplazo.
+    offsets = np.concatenate(([0], np.cumsum(width, dtype=np.int64)))
+    cells = np.sort(rng.choice(offsets[-1], size=nnz, replace=False))
+    rows = np.searchsorted(offsets, cells, side="right") - 1
+    return rows, lo[rows] + (cells - offsets[rows])
+
+
+def _sample_degrees(degrees, n, rng):
+    # degrees[i] columnas distintas en la fila i (de n posibles). Se sortea
+    # lo que falta a cada fila y se eliminan repetidos hasta completar; las
+    # filas de más de 1/8 de n (donde los repetidos frenan la convergencia)
+    # van aparte, con un muestreo sin reemplazo por fila.
+    m = degrees.shape[0]
+    dense = np.flatnonzero(8 * degrees > n)
+    need = degrees.copy()
+    need[dense] = 0
+    keys = np.empty(0, dtype=np.int64)  # fila * n + columna, ordenadas
+    while need.any():
+        rows = np.repeat(np.arange(m, dtype=np.int64), need)
+        new = np.sort(rows * n + rng.integers(0, n, size=rows.size))
+        new = new[np.concatenate(([True], new[1:] != new[:-1]))]
+        if keys.size:
+            pos = np.searchsorted(keys, new).clip(max=keys.size - 1)
+            new = new[keys[pos] != new]
+        need -= np.bincount(new // n, minlength=m)
+        # Dos tramos ya ordenados: la ordenación estable (timsort) solo los mezcla
+        keys = np.sort(np.concatenate((keys, new)), kind="stable")
+    if dense.size:
+        extra = [i * n + rng.choice(n, size=degrees[i], replace=False) for i in dense]
+        keys = np.sort(np.concatenate([keys] + extra), kind="stable")
+    return keys // n, keys % n
+
+
+def _initial_size(pattern, m, nnz):
+    # banda: la mínima; bloques: los que quedarían medio llenos
+    return 1 if pattern == "banded" else max(1, -(-2 * nnz // max(1, m)))
+
+
+def _pattern_windows(pattern, m, n, size):
+    # (lo, width): la fila i admite las columnas [lo[i], lo[i] + width[i])
+    rows = np.arange(m, dtype=np.int64)
+    if pattern == "uniform":
+        return np.zeros(m, dtype=np.int64), np.full(m, n, dtype=np.int64)
+    if pattern == "banded":
+        lo = np.maximum(rows - size, 0)
+        hi = np.minimum(rows + size + 1, n)
+    else:
+        lo = rows // size * size
+        hi = np.minimum(lo + size, n)
+    lo = lo.clip(max=n)
+    return lo, np.maximum(hi - lo, 0)
+
+
+def random_csr(m, n=None, density=None, nnz=None, pattern="uniform", seed=None,
+               dtype=np.float64, bandwidth=None, block_size=None, alpha=2.5):
+    # CSR m×n con exactamente nnz no nulos distintos (nnz = round(density*m*n)
+    # si se da density), índices ordenados y sin duplicados:
+    #   uniform         posiciones uniformes en toda la matriz
+    #   banded          |i - j| <= bandwidth (por defecto, la banda mínima que cabe)
+    #   powerlaw        grados de fila ~ ley de potencias de exponente alpha
+    #   block_diagonal  bloques cuadrados de block_size en la diagonal
+    n = m if n is None else n
+    if nnz is None:
+        if density is None:
+            raise ValueError("hay que indicar density o nnz")
+        nnz = int(round(density * m * n))
+    if pattern not in SPARSE_PATTERNS:
+        raise ValueError(f"patrón desconocido: {pattern} (opciones: {', '.join(SPARSE_PATTERNS)})")
+    rng = np.random.default_rng(seed)
+    rows_idx = np.arange(m, dtype=np.int64)
+
+    if pattern == "powerlaw":
+        # Grado esperado de la fila de rango r ~ r^(-1/(alpha-1)); el orden de
+        # las filas se baraja para no concentrar las pesadas arriba.
+        weights = rng.permutation((rows_idx + 1.0) ** (-1.0 / (alpha - 1.0)))
+        caps = np.full(m, n, dtype=np.int64)
+        if nnz > caps.sum():
+            raise ValueError(f"nnz={nnz} no cabe en una matriz {m}×{n}")
+        rows, cols = _sample_degrees(_split_degrees(nnz, weights, caps, rng), n, rng)
+    else:
+        size = bandwidth if pattern == "banded" else block_size
+        auto = size is None and pattern != "uniform"
+        if auto:
+            size = _initial_size(pattern, m, nnz)
+        lo, width = _pattern_windows(pattern, m, n, size)
+        # Sin tamaño explícito: se duplica la banda/el bloque hasta que quepa nnz
+        while auto and width.sum() < nnz and size < max(m, n):
+            size *= 2
+            lo, width = _pattern_windows(pattern, m, n, size)
+        if nnz > width.sum():
+            raise ValueError(f"nnz={nnz} no cabe en el patrón {pattern} ({width.sum()} celdas)")
+        rows, cols = _sample_windows(nnz, lo, width, rng)
+
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=m))))
+    data = rng.random(nnz).astype(dtype, copy=False)
+    A = csr_matrix((data, cols, indptr), shape=(m, n))
+    A.has_sorted_indices = True
+    return A
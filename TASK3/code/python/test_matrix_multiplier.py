@@ -1,23 +1,39 @@
 import random
 import time
 import os
-import psutil
 import sys
 import csv
 import numpy as np
-from scipy.io import loadmat
-from scipy.sparse import csr_matrix
 from matrix_multiplier import (
-    multiply_basic, strassen, multiply_blocked, multiply_sparse, generate_sparse_matrix,
-    multiply_numpy, multiply_numba_basic, multiply_numba_parallel, multiply_numba_blocked,
-    get_numba_threads, get_blas_threads,
+    multiply_basic, strassen, strassen_adaptive, strassen_parallel, multiply_blocked, multiply_sparse, generate_sparse_matrix,
+    multiply_numpy, multiply_numba_basic, multiply_numba_parallel, multiply_numba_blocked, multiply_numba_winograd,
+    multiply_numba_packed, multiply_batched, strassen_parallel_threads,
+    get_numba_threads, reset_numba_threads, get_blas_threads, STRASSEN_CUTOFF,
 )
+from autotune import resolve_block_size
+from sparse_multiplier import spgemm, plan_spgemm, spmm, choose_spmm_format
+from sparse_datasets import load_matrices
+from memory_profile import profile_memory
 
 matrix_sizes = [128, 256, 512, 1024]
 runs = 5
 warmup_runs = 1
 thread_sweep = [1, 2, 4, 8]
-block_size = 64
+block_size = None  # None: el afinado por autotune.py para esta CPU (o 64)
+strassen_cutoff = STRASSEN_CUTOFF
+strassen_levels = 1
+# (dtype de entrada, acumulación); float64 es el barrido principal
+dtype_sweep = [("float32", None), ("float32", "wide"), ("int8", "wide")]
+# (n por matriz, tamaño de lote) para la API batched
+batch_sweep = [(8, 100000), (16, 20000), (32, 5000), (64, 1000)]
+# Columnas del operando denso en SpMM (dispersa × densa)
+spmm_widths = [1, 16, 128, 1024]
+spmm_max_bytes = 1 << 30  # se salta un ancho si X o Y no caben en esto
+# Patrones estructurados para SpGEMM (n, fracción de ceros)
+sparse_patterns = ["banded", "powerlaw", "block_diagonal"]
+sparse_pattern_size, sparse_pattern_sparsity = 5000, 0.999
+# Matrices reales (nombre o ruta .mat/.mtx); se convierten una vez a la caché CSR
+sparse_datasets = ["mc2depi"]
 
 if len(sys.argv) >= 2:
     matrix_sizes = [int(sys.argv[1])]
@@ -30,44 +46,64 @@ def generate_matrix(n, seed=None):
     rng = random.Random(seed)
     return [[rng.random() for _ in range(n)] for _ in range(n)]
 
+def cast_matrix(M, dtype):
+    M = np.array(M)
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        M = M * 100  # valores 0..99, dentro del rango de int8
+    return M.astype(dtype)
+
 output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../data"))
 os.makedirs(output_dir, exist_ok=True)
 output_file = os.path.join(output_dir, "benchmark_python_results.csv")
 
 def benchmark(name, func, A, B, runs=3, warmup=1, metadata=None):
+    # Los hilos de Numba que fijó el enfoque anterior no pasan a este
+    # (para aislar también BLAS y el heap: python harness.py --isolate)
+    reset_numba_threads()
     wall_times, cpu_times = [], []
-    peak_mem = 0
-    process = psutil.Process(os.getpid())
 
     for _ in range(warmup):
         _ = func(A, B)
 
     for r in range(runs):
-        mem_before = process.memory_info().rss / 1024
-        cpu_before = process.cpu_times().user + process.cpu_times().system
-        start = time.time()
+        cpu_before = time.process_time()
+        start = time.perf_counter()
         C = func(A, B)
-        end = time.time()
-        cpu_after = process.cpu_times().user + process.cpu_times().system
-        mem_after = process.memory_info().rss / 1024
+        end = time.perf_counter()
+        cpu_after = time.process_time()
 
         wall_time = end - start
         cpu_time = cpu_after - cpu_before
         wall_times.append(wall_time)
         cpu_times.append(cpu_time)
-        peak_mem = max(peak_mem, mem_after)
 
-        print(f" [{name}] Run {r+1}: {wall_time:.6f}s | CPU {cpu_time:.6f}s | Peak {peak_mem:.2f} KB")
+        print(f" [{name}] Run {r+1}: {wall_time:.6f}s | CPU {cpu_time:.6f}s")
+
+    # PeakMemoryKB: pico de memoria de una llamada sobre la de antes de ella
+    # (RSS muestreado, VmHWM y tracemalloc), medido aparte de los tiempos
+    peak_mem = profile_memory(func, A, B)["peak_delta_kb"]
+    print(f" [{name}] Peak +{peak_mem:.2f} KB")
 
     avg_wall = sum(wall_times)/runs
     avg_cpu = sum(cpu_times)/runs
     return avg_wall, avg_cpu, peak_mem, metadata or {}
 
 def write_row(writer, approach, n, avg_wall, avg_cpu, peak_mem,
-              threads=None, speedup=None, efficiency=None, extra=None):
+              threads=None, speedup=None, efficiency=None, extra=None, dtype="float64", baseline=None):
+    # baseline: referencia del speedup si no es Basic ("loop", "scipy"). Entonces
+    # speedup y eficiencia van a Extra y las columnas *_vs_Basic quedan vacías
+    if baseline is not None:
+        parts = [extra] if extra else []
+        if isinstance(speedup, (int, float)):
+            parts.append(f"speedup_vs={baseline}:{speedup:.3f}")
+        if isinstance(efficiency, (int, float)):
+            parts.append(f"efficiency_vs={baseline}:{efficiency:.3f}")
+        extra = ";".join(parts)
+        speedup = efficiency = None
     writer.writerow({
         "Approach": approach,
         "MatrixSize": n,
+        "DType": dtype,
         "AverageWall": f"{avg_wall:.6f}",
         "AverageCPU": f"{avg_cpu:.6f}",
         "PeakMemoryKB": f"{peak_mem:.2f}",
@@ -80,11 +116,28 @@ def write_row(writer, approach, n, avg_wall, avg_cpu, peak_mem,
 def compute_speedup(baseline_time, method_time):
     return baseline_time / method_time if method_time > 0 else float("inf")
 
+def sparse_thread_rows(writer, label, A_sparse, scipy_wall):
+    # SpGEMM Gustavson en Numba por número de hilos; el speedup es respecto
+    # a SciPy (A.dot(B), un hilo)
+    for t in thread_sweep:
+        try:
+            w, c, mem, _ = benchmark(f"{label}_Numba_{t}t", lambda X, Y: spgemm(X, Y, threads=t), A_sparse, A_sparse, runs=runs, warmup=warmup_runs)
+            sp = compute_speedup(scipy_wall, w)
+            write_row(writer, f"{label}_Numba", A_sparse.shape[0], w, c, mem, threads=t, speedup=sp, efficiency=sp / t, baseline="scipy")
+            # Mismo producto con el patrón ya planificado: solo la pasada numérica
+            plan = plan_spgemm(A_sparse, A_sparse, threads=t, cache=False)
+            C_out = plan.empty()
+            w, c, mem, _ = benchmark(f"{label}_NumbaPlanned_{t}t", lambda X, Y: plan.execute(X, Y, out=C_out), A_sparse, A_sparse, runs=runs, warmup=warmup_runs)
+            sp = compute_speedup(scipy_wall, w)
+            write_row(writer, f"{label}_NumbaPlanned", A_sparse.shape[0], w, c, mem, threads=t, speedup=sp, efficiency=sp / t, baseline="scipy")
+        except Exception as e:
+            print(f"{label}_Numba_{t}t error:", e)
+
 print("Detectando hilos BLAS (NumPy):", get_blas_threads())
 print("Detectando hilos Numba:", get_numba_threads())
 
 with open(output_file, "w", newline="") as f:
-    fieldnames = ["Approach","MatrixSize","AverageWall","AverageCPU","PeakMemoryKB","Threads","Speedup_vs_Basic","Efficiency_per_thread","Extra"]
+    fieldnames = ["Approach","MatrixSize","DType","AverageWall","AverageCPU","PeakMemoryKB","Threads","Speedup_vs_Basic","Efficiency_per_thread","Extra"]
     writer = csv.DictWriter(f, fieldnames=fieldnames)
     writer.writeheader()
 
@@ -92,26 +145,42 @@ with open(output_file, "w", newline="") as f:
         print(f"\nMatrix {n}x{n}")
         A = generate_matrix(n, seed=42)
         B = generate_matrix(n, seed=1337)
+        # Conversión fuera de la zona medida: los enfoques NumPy/Numba reciben
+        # ndarrays float64 C-contiguos y no copian la entrada en cada run
+        An, Bn = np.asarray(A), np.asarray(B)
 
         base_wall, base_cpu, base_mem, _ = benchmark("Basic", multiply_basic, A, B, runs=runs, warmup=warmup_runs)
         write_row(writer, "Basic", n, base_wall, base_cpu, base_mem, threads=1, speedup=1.0, efficiency=1.0)
 
         if n & (n-1) == 0:
-            s_wall, s_cpu, s_mem, _ = benchmark("Strassen", strassen, A, B, runs=runs, warmup=warmup_runs)
+            s_wall, s_cpu, s_mem, _ = benchmark("Strassen", strassen, An, Bn, runs=runs, warmup=warmup_runs)
             s_sp = compute_speedup(base_wall, s_wall)
             write_row(writer, "Strassen", n, s_wall, s_cpu, s_mem, threads=None, speedup=s_sp, efficiency=None)
 
-        blk_wall, blk_cpu, blk_mem, _ = benchmark("Blocked", lambda X, Y: multiply_blocked(X, Y, block_size), A, B, runs=runs, warmup=warmup_runs)
+        sa_wall, sa_cpu, sa_mem, _ = benchmark("Strassen_Adaptive", lambda X, Y: strassen_adaptive(X, Y, cutoff=strassen_cutoff), An, Bn, runs=runs, warmup=warmup_runs)
+        sa_sp = compute_speedup(base_wall, sa_wall)
+        write_row(writer, "Strassen_Adaptive", n, sa_wall, sa_cpu, sa_mem, threads=None, speedup=sa_sp, efficiency=None, extra=f"cutoff={strassen_cutoff}")
+
+        for t in thread_sweep:
+            if strassen_parallel_threads(t) != t:
+                # Sin threadpoolctl caería a serie: no sería una medida con t hilos
+                print(f"Strassen_Parallel_{t}t omitido: sin threadpoolctl se ejecuta en serie")
+                continue
+            sp_wall, sp_cpu, sp_mem, _ = benchmark(f"Strassen_Parallel_{t}t", lambda X, Y: strassen_parallel(X, Y, threads=t, cutoff=strassen_cutoff, levels=strassen_levels), An, Bn, runs=runs, warmup=warmup_runs)
+            sp = compute_speedup(base_wall, sp_wall)
+            write_row(writer, "Strassen_Parallel", n, sp_wall, sp_cpu, sp_mem, threads=t, speedup=sp, efficiency=sp / t, extra=f"cutoff={strassen_cutoff};levels={strassen_levels}")
+
+        blk_wall, blk_cpu, blk_mem, _ = benchmark("Blocked", lambda X, Y: multiply_blocked(X, Y, block_size), An, Bn, runs=runs, warmup=warmup_runs)
         blk_sp = compute_speedup(base_wall, blk_wall)
-        write_row(writer, "Blocked", n, blk_wall, blk_cpu, blk_mem, threads=None, speedup=blk_sp, efficiency=None)
+        write_row(writer, "Blocked", n, blk_wall, blk_cpu, blk_mem, threads=None, speedup=blk_sp, efficiency=None, extra=f"block_size={block_size or resolve_block_size('blocked', n)}")
 
-        np_wall, np_cpu, np_mem, meta = benchmark("NumPy_BLAS", multiply_numpy, A, B, runs=runs, warmup=warmup_runs, metadata={"blas_threads": get_blas_threads()})
+        np_wall, np_cpu, np_mem, meta = benchmark("NumPy_BLAS", multiply_numpy, An, Bn, runs=runs, warmup=warmup_runs, metadata={"blas_threads": get_blas_threads()})
         np_sp = compute_speedup(base_wall, np_wall)
         eff_np = (np_sp/meta["blas_threads"]) if meta.get("blas_threads") else None
         write_row(writer, "NumPy_BLAS", n, np_wall, np_cpu, np_mem, threads=meta.get("blas_threads"), speedup=np_sp, efficiency=eff_np)
 
         try:
-            nb1_wall, nb1_cpu, nb1_mem, _ = benchmark("Numba_Basic_1t", lambda X, Y: multiply_numba_basic(X, Y, threads=1), A, B, runs=runs, warmup=warmup_runs)
+            nb1_wall, nb1_cpu, nb1_mem, _ = benchmark("Numba_Basic_1t", lambda X, Y: multiply_numba_basic(X, Y, threads=1), An, Bn, runs=runs, warmup=warmup_runs)
             nb1_sp = compute_speedup(base_wall, nb1_wall)
             write_row(writer, "Numba_Basic_1t", n, nb1_wall, nb1_cpu, nb1_mem, threads=1, speedup=nb1_sp, efficiency=nb1_sp)
         except Exception as e:
@@ -119,7 +188,7 @@ with open(output_file, "w", newline="") as f:
 
         for t in thread_sweep:
             try:
-                nbp_wall, nbp_cpu, nbp_mem, _ = benchmark(f"Numba_Parallel_{t}t", lambda X, Y: multiply_numba_parallel(X, Y, threads=t), A, B, runs=runs, warmup=warmup_runs)
+                nbp_wall, nbp_cpu, nbp_mem, _ = benchmark(f"Numba_Parallel_{t}t", lambda X, Y: multiply_numba_parallel(X, Y, threads=t), An, Bn, runs=runs, warmup=warmup_runs)
                 sp = compute_speedup(base_wall, nbp_wall)
                 eff = sp / t
                 write_row(writer, "Numba_Parallel", n, nbp_wall, nbp_cpu, nbp_mem, threads=t, speedup=sp, efficiency=eff)
@@ -128,34 +197,73 @@ with open(output_file, "w", newline="") as f:
 
         for t in thread_sweep:
             try:
-                nbb_wall, nbb_cpu, nbb_mem, _ = benchmark(f"Numba_Blocked_{t}t", lambda X, Y: multiply_numba_blocked(X, Y, block_size=block_size, threads=t), A, B, runs=runs, warmup=warmup_runs)
+                nbb_wall, nbb_cpu, nbb_mem, _ = benchmark(f"Numba_Blocked_{t}t", lambda X, Y: multiply_numba_blocked(X, Y, block_size=block_size, threads=t), An, Bn, runs=runs, warmup=warmup_runs)
                 sp = compute_speedup(base_wall, nbb_wall)
                 eff = sp / t
-                write_row(writer, "Numba_Blocked", n, nbb_wall, nbb_cpu, nbb_mem, threads=t, speedup=sp, efficiency=eff, extra=f"block_size={block_size}")
+                write_row(writer, "Numba_Blocked", n, nbb_wall, nbb_cpu, nbb_mem, threads=t, speedup=sp, efficiency=eff, extra=f"block_size={block_size or resolve_block_size('numba_blocked', n, t)}")
             except Exception as e:
                 print(f"Numba_Blocked_{t}t error:", e)
 
-    try:
-        print("\nSparse Matrix mc2depi")
-        sparse_path_mat = "../../mc2depi.mat"
-        if os.path.exists(sparse_path_mat):
-            mat_data = loadmat(sparse_path_mat, struct_as_record=False, squeeze_me=True)
-            if "Problem" in mat_data:
-                problem_struct = mat_data["Problem"]
-                if hasattr(problem_struct, "A"):
-                    A_sparse = csr_matrix(problem_struct.A)
-                else:
-                    raise ValueError("El struct 'Problem' no contiene campo 'A'")
-            else:
-                raise ValueError("No se encontró 'Problem' en mc2depi.mat")
-        else:
-            raise FileNotFoundError("No se encontró mc2depi.mat")
-
-        s_wall, s_cpu, s_mem, _ = benchmark("Sparse_mc2depi", multiply_sparse, A_sparse, A_sparse, runs=runs, warmup=warmup_runs)
-        write_row(writer, "Sparse_mc2depi", A_sparse.shape[0], s_wall, s_cpu, s_mem, threads=None, speedup=None, efficiency=None)
-
-    except Exception as e:
-        print("No se pudo cargar mc2depi:", e)
+        for t in thread_sweep:
+            try:
+                nbw_wall, nbw_cpu, nbw_mem, _ = benchmark(f"Numba_Winograd_{t}t", lambda X, Y: multiply_numba_winograd(X, Y, cutoff=strassen_cutoff, block_size=block_size, threads=t), An, Bn, runs=runs, warmup=warmup_runs)
+                sp = compute_speedup(base_wall, nbw_wall)
+                eff = sp / t
+                write_row(writer, "Numba_Winograd", n, nbw_wall, nbw_cpu, nbw_mem, threads=t, speedup=sp, efficiency=eff, extra=f"cutoff={strassen_cutoff};block_size={block_size or resolve_block_size('numba_blocked', strassen_cutoff, t)}")
+            except Exception as e:
+                print(f"Numba_Winograd_{t}t error:", e)
+
+        for t in thread_sweep:
+            try:
+                nbk_wall, nbk_cpu, nbk_mem, _ = benchmark(f"Numba_Packed_{t}t", lambda X, Y: multiply_numba_packed(X, Y, threads=t), An, Bn, runs=runs, warmup=warmup_runs)
+                sp = compute_speedup(base_wall, nbk_wall)
+                eff = sp / t
+                write_row(writer, "Numba_Packed", n, nbk_wall, nbk_cpu, nbk_mem, threads=t, speedup=sp, efficiency=eff, extra="micro_kernel=4x8")
+            except Exception as e:
+                print(f"Numba_Packed_{t}t error:", e)
+
+        for dt, acc in dtype_sweep:
+            Ad, Bd = cast_matrix(A, dt), cast_matrix(B, dt)
+            acc_extra = f"accumulate={acc}" if acc else ""
+            dtype_methods = [
+                ("NumPy_BLAS", lambda X, Y: multiply_numpy(X, Y, accumulate=acc)),
+                ("Strassen_Adaptive", lambda X, Y: strassen_adaptive(X, Y, cutoff=strassen_cutoff, accumulate=acc)),
+                ("Numba_Parallel", lambda X, Y: multiply_numba_parallel(X, Y, accumulate=acc)),
+                ("Numba_Packed", lambda X, Y: multiply_numba_packed(X, Y, accumulate=acc)),
+            ]
+            for name, func in dtype_methods:
+                try:
+                    d_wall, d_cpu, d_mem, _ = benchmark(f"{name}_{dt}{'_' + acc if acc else ''}", func, Ad, Bd, runs=runs, warmup=warmup_runs)
+                    write_row(writer, name, n, d_wall, d_cpu, d_mem, threads=None, speedup=compute_speedup(base_wall, d_wall), efficiency=None, extra=acc_extra, dtype=dt)
+                except Exception as e:
+                    print(f"{name}_{dt} error:", e)
+
+    print("\nBatched (muchas matrices pequeñas)")
+    rng = np.random.default_rng(7)
+    for bn, batch in batch_sweep:
+        As = rng.random((batch, bn, bn))
+        Bs = rng.random((batch, bn, bn))
+        batch_methods = [("Batched_Loop", None, lambda X, Y: [multiply_numpy(X[i], Y[i]) for i in range(len(X))]),
+                         ("Batched_NumPy", None, lambda X, Y: multiply_batched(X, Y, method="numpy"))]
+        batch_methods += [("Batched_Numba", t, lambda X, Y, t=t: multiply_batched(X, Y, threads=t)) for t in thread_sweep]
+        loop_wall = None  # el speedup de estas filas es respecto al bucle por pareja
+        for name, t, func in batch_methods:
+            label = f"{name}_{bn}x{bn}{f'_{t}t' if t else ''}"
+            try:
+                b_wall, b_cpu, b_mem, _ = benchmark(label, func, As, Bs, runs=runs, warmup=warmup_runs)
+                loop_wall = loop_wall or b_wall
+                sp = compute_speedup(loop_wall, b_wall)
+                write_row(writer, name, bn, b_wall, b_cpu, b_mem, threads=t, speedup=sp, efficiency=sp / t if t else None,
+                          extra=f"batch={batch};products_per_s={batch / b_wall:.0f}", baseline="loop")
+            except Exception as e:
+                print(f"{label} error:", e)
+
+    print("\nSparse Matrices (datasets)")
+    datasets = load_matrices(sparse_datasets)
+    for name, A_sparse in datasets:
+        s_wall, s_cpu, s_mem, _ = benchmark(f"Sparse_{name}", multiply_sparse, A_sparse, A_sparse, runs=runs, warmup=warmup_runs)
+        write_row(writer, f"Sparse_{name}", A_sparse.shape[0], s_wall, s_cpu, s_mem, threads=None, speedup=None, efficiency=None, extra=f"nnz={A_sparse.nnz}")
+        sparse_thread_rows(writer, f"Sparse_{name}", A_sparse, s_wall)
 
     print("\nSynthetic Sparse Matrices (varying sparsity)")
     sparsity_levels = [0.1, 0.5, 0.9]
@@ -163,5 +271,35 @@ with open(output_file, "w", newline="") as f:
         A_sparse = generate_sparse_matrix(500, sparsity=sparsity, seed=123)
         s_wall, s_cpu, s_mem, _ = benchmark(f"SparseSynthetic_{int(sparsity*100)}pctZeros", multiply_sparse, A_sparse, A_sparse, runs=runs, warmup=warmup_runs)
         write_row(writer, f"SparseSynthetic_{int(sparsity*100)}pctZeros", A_sparse.shape[0], s_wall, s_cpu, s_mem, threads=None, speedup=None, efficiency=None)
+        sparse_thread_rows(writer, f"SparseSynthetic_{int(sparsity*100)}pctZeros", A_sparse, s_wall)
+
+    print("\nStructured Sparse Matrices")
+    for pattern in sparse_patterns:
+        A_sparse = generate_sparse_matrix(sparse_pattern_size, sparsity=sparse_pattern_sparsity, seed=123, pattern=pattern)
+        s_wall, s_cpu, s_mem, _ = benchmark(f"SparsePattern_{pattern}", multiply_sparse, A_sparse, A_sparse, runs=runs, warmup=warmup_runs)
+        write_row(writer, f"SparsePattern_{pattern}", A_sparse.shape[0], s_wall, s_cpu, s_mem, threads=None, speedup=None, efficiency=None, extra=f"nnz={A_sparse.nnz}")
+        sparse_thread_rows(writer, f"SparsePattern_{pattern}", A_sparse, s_wall)
+
+    print("\nSpMM (dispersa × densa)")
+    spmm_inputs = [("SpMM_Synthetic", generate_sparse_matrix(2000, sparsity=0.99, seed=321))]
+    spmm_inputs += [(f"SpMM_{name}", A_sparse) for name, A_sparse in datasets]
+    rng = np.random.default_rng(11)
+    for label, S in spmm_inputs:
+        fmt = choose_spmm_format(S)
+        for w in spmm_widths:
+            if max(S.shape) * w * 8 > spmm_max_bytes:
+                print(f"{label} width={w}: omitido (operando denso demasiado grande)")
+                continue
+            X = rng.random((S.shape[1], w))
+            # speedup de las filas Numba respecto a SciPy (A @ X, un hilo)
+            sc_wall, sc_cpu, sc_mem, _ = benchmark(f"{label}_SciPy_w{w}", lambda M, Y: M @ Y, S, X, runs=runs, warmup=warmup_runs)
+            write_row(writer, f"{label}_SciPy", S.shape[0], sc_wall, sc_cpu, sc_mem, threads=1, speedup=1.0, efficiency=1.0, extra=f"width={w}", baseline="scipy")
+            for t in thread_sweep:
+                try:
+                    nb_wall, nb_cpu, nb_mem, _ = benchmark(f"{label}_Numba_w{w}_{t}t", lambda M, Y: spmm(M, Y, threads=t), S, X, runs=runs, warmup=warmup_runs)
+                    sp = compute_speedup(sc_wall, nb_wall)
+                    write_row(writer, f"{label}_Numba", S.shape[0], nb_wall, nb_cpu, nb_mem, threads=t, speedup=sp, efficiency=sp / t, extra=f"width={w};format={fmt}", baseline="scipy")
+                except Exception as e:
+                    print(f"{label}_Numba_w{w}_{t}t error:", e)
 
 print(f"\nResultados guardados en: {output_file}")
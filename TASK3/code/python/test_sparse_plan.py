@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix, random as sparse_random
+
+from sparse_multiplier import clear_plans, plan_spgemm, spgemm
+
+
+@pytest.fixture(autouse=True)
+def fresh_plans():
+    clear_plans()
+    yield
+    clear_plans()
+
+
+def test_execute_into_empty_reuses_pattern():
+    A = sparse_random(60, 40, density=0.1, format="csr", random_state=0)
+    B = sparse_random(40, 50, density=0.1, format="csr", random_state=1)
+    plan = plan_spgemm(A, B)
+    out = plan.empty()
+    assert plan.execute(A, B, out=out) is out
+    np.testing.assert_allclose(out.toarray(), (A @ B).toarray())
+    # Mismo patrón, otros valores
+    A.data *= 2.0
+    plan.execute(A, B, out=out)
+    np.testing.assert_allclose(out.toarray(), (A @ B).toarray())
+
+
+def test_empty_product():
+    # nnz == 0: los índices de C tienen tamaño cero
+    A = csr_matrix((5, 4))
+    B = sparse_random(4, 6, density=0.5, format="csr", random_state=0)
+    plan = plan_spgemm(A, B)
+    assert plan.nnz == 0
+    out = plan.empty()
+    assert plan.execute(A, B, out=out) is out
+    assert out.shape == (5, 6) and out.nnz == 0
+    C = spgemm(A, B, reuse=True)
+    assert C.shape == (5, 6) and C.nnz == 0
+
+
+def test_execute_rejects_foreign_out():
+    A = sparse_random(30, 30, density=0.1, format="csr", random_state=0)
+    plan = plan_spgemm(A, A)
+    with pytest.raises(ValueError):
+        plan.execute(A, A, out=(A @ A).tocsr())
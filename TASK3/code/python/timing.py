@@ -0,0 +1,117 @@
+import math
+import os
+import time
+
+import numpy as np
+import psutil
+from scipy import stats
+
+# Repeticiones adaptativas: se mide hasta que el semiancho del intervalo de
+# confianza de la media baja de TARGET_REL_CI (relativo a la media), con un
+# mínimo de MIN_RUNS muestras y sin pasar de MAX_RUNS ni de MAX_CELL_S.
+MIN_RUNS = 5
+MAX_RUNS = 200
+TARGET_REL_CI = 0.02
+MAX_CELL_S = 10.0
+CONFIDENCE = 0.95
+# Por debajo de esto una llamada se repite dentro de cada muestra (como timeit)
+MIN_SAMPLE_NS = 1_000_000
+# Regresión: más lento con p < REGRESSION_ALPHA y mediana > 1 + REGRESSION_MIN_RATIO
+REGRESSION_ALPHA = 0.01
+REGRESSION_MIN_RATIO = 0.05
+
+
+def calibrate(func, A, B, min_sample_ns=MIN_SAMPLE_NS, limit=1 << 20):
+    # Llamadas por muestra para que cada muestra dure al menos min_sample_ns;
+    # las llamadas de calibración sirven también de calentamiento
+    number = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            func(A, B)
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_sample_ns or number >= limit:
+            return number
+        number = min(limit, max(number * 2, math.ceil(number * min_sample_ns / max(elapsed, 1))))
+
+
+def rel_ci(samples, confidence=CONFIDENCE):
+    # Semiancho del IC de la media (t de Student) dividido por la media
+    n = len(samples)
+    if n < 2:
+        return math.inf
+    mean = float(np.mean(samples))
+    if mean <= 0:
+        return math.inf
+    half = stats.t.ppf((1 + confidence) / 2, n - 1) * float(np.std(samples, ddof=1)) / math.sqrt(n)
+    return half / mean
+
+
+def measure(func, A, B, min_runs=MIN_RUNS, max_runs=MAX_RUNS, target_rel_ci=TARGET_REL_CI,
+            max_time_s=MAX_CELL_S, warmup=1, confidence=CONFIDENCE):
+    # Devuelve (wall, cpu, number, peak_rss_kb): tiempos por llamada en
+    # segundos (perf_counter_ns / process_time_ns, este último suma todos
+    # los hilos del proceso) y llamadas agrupadas por muestra
+    process = psutil.Process(os.getpid())
+    for _ in range(warmup):
+        func(A, B)
+    number = calibrate(func, A, B)
+    wall, cpu = [], []
+    peak_mem = 0
+    deadline = time.perf_counter_ns() + int(max_time_s * 1e9)
+    while True:
+        cpu_start = time.process_time_ns()
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            func(A, B)
+        end = time.perf_counter_ns()
+        cpu_end = time.process_time_ns()
+        wall.append((end - start) / number / 1e9)
+        cpu.append((cpu_end - cpu_start) / number / 1e9)
+        peak_mem = max(peak_mem, process.memory_info().rss / 1024)
+        if len(wall) >= max_runs:
+            break
+        if len(wall) >= min_runs and (end >= deadline or rel_ci(wall, confidence) <= target_rel_ci):
+            break
+    return wall, cpu, number, peak_mem
+
+
+def summarize(samples, confidence=CONFIDENCE):
+    x = np.asarray(samples, dtype=np.float64)
+    q1, median, q3, p95 = np.percentile(x, [25, 50, 75, 95])
+    iqr = q3 - q1
+    # Atípicos por las vallas de Tukey (1.5 × IQR)
+    outliers = int(np.count_nonzero((x < q1 - 1.5 * iqr) | (x > q3 + 1.5 * iqr)))
+    mean = float(x.mean())
+    std = float(x.std(ddof=1)) if x.size > 1 else 0.0
+    half = rel_ci(x, confidence) * mean if x.size > 1 else math.inf
+    return {
+        "n": int(x.size),
+        "mean": mean,
+        "median": float(median),
+        "min": float(x.min()),
+        "p95": float(p95),
+        "std": std,
+        "ci_low": mean - half,
+        "ci_high": mean + half,
+        "rel_ci": half / mean if mean > 0 else math.inf,
+        "outliers": outliers,
+    }
+
+
+def compare(baseline, candidate, alpha=REGRESSION_ALPHA, min_ratio=REGRESSION_MIN_RATIO):
+    # Mann-Whitney U unilateral sobre las muestras (no supone normalidad, y
+    # las colas largas del ruido del sistema son habituales). "slower" exige
+    # además una diferencia de medianas relevante, no solo significativa.
+    ratio = float(np.median(candidate) / np.median(baseline))
+    if len(baseline) < 3 or len(candidate) < 3:
+        return {"ratio": ratio, "p_slower": math.nan, "p_faster": math.nan, "status": "insufficient"}
+    p_slower = stats.mannwhitneyu(candidate, baseline, alternative="greater").pvalue
+    p_faster = stats.mannwhitneyu(candidate, baseline, alternative="less").pvalue
+    if p_slower < alpha and ratio > 1 + min_ratio:
+        status = "slower"
+    elif p_faster < alpha and ratio < 1 - min_ratio:
+        status = "faster"
+    else:
+        status = "same"
+    return {"ratio": ratio, "p_slower": float(p_slower), "p_faster": float(p_faster), "status": status}
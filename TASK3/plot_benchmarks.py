@@ -25,6 +25,10 @@ def load_data(file_path):
     if "AverageWall" in df.columns:
         df["AverageTime"] = df["AverageWall"]
 
+    # Las filas del barrido de dtype no se mezclan con las de float64
+    if "DType" in df.columns:
+        df = df[df["DType"].fillna("float64") == "float64"]
+
     return df
 
 data = {}
@@ -32,8 +36,9 @@ for lang, file in files.items():
     if os.path.exists(file):
         data[lang] = load_data(file)
 
-dense_methods = ["Basic", "Blocked", "Strassen", "NumPy_BLAS",
-                 "Numba_Parallel", "Numba_Blocked"]
+dense_methods = ["Basic", "Blocked", "Strassen", "Strassen_Adaptive", "NumPy_BLAS",
+                 "Strassen_Parallel", "Numba_Parallel", "Numba_Blocked",
+                 "Numba_Winograd", "Numba_Packed"]
 
 for lang, df in data.items():
     df_dense = df[df["Approach"].isin(dense_methods)]
@@ -57,7 +62,12 @@ for lang, df in data.items():
         df_sparse = df[df["Approach"].str.contains("Sparse", na=False)]
         if not df_sparse.empty:
             plt.figure(figsize=(10, 6))
-            plt.bar(df_sparse["Approach"], df_sparse["AverageTime"])
+            labels = df_sparse["Approach"]
+            if "Threads" in df_sparse.columns:
+                # Las filas del barrido de hilos comparten Approach
+                labels = [a if pd.isna(t) else f"{a} ({int(t)}t)"
+                          for a, t in zip(df_sparse["Approach"], df_sparse["Threads"])]
+            plt.bar(labels, df_sparse["AverageTime"])
             plt.title(f"{lang} – Sparse Methods")
             plt.xlabel("Método Sparse")
             plt.ylabel("Wall Time (s)")
@@ -1,6 +1,8 @@
 import numpy as np
 from collections import Counter
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
+
+from worker_pool import WorkerPool, acquire_pool
 
 
 def mapper(transactions):
@@ -18,12 +20,14 @@ def reducer(counters):
     return total
 
 
-def frequent_items(transactions, workers=None, min_support=1):
-    if workers is None:
+def frequent_items(transactions, workers=None, min_support=1, pool: WorkerPool | None = None):
+    if pool is not None:
+        workers = pool.workers
+    elif workers is None:
         workers = cpu_count()
 
     chunks = np.array_split(transactions, workers)
-    with Pool(workers) as p:
+    with acquire_pool(pool, workers) as (p, _):
         mapped = p.map(mapper, chunks)
     counts = reducer(mapped)
     return {item: cnt for item, cnt in counts.items() if cnt >= min_support}
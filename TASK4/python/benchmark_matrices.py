@@ -1,10 +1,17 @@
+import os
+import tempfile
 import time
 import numpy as np
 
 from matrix_local import baseline_multiply, parallel_multiply
 from mapreduce_matrix import distributed_multiply
+from out_of_core import out_of_core_multiply
+from worker_pool import WorkerPool
 
 SIZES = [256, 512, 1024]
+RECT_SHAPES = [(1000, 3000, 700)]
+OOC_SHAPES = [(2000, 2000, 2000)]
+OOC_BUDGETS = [256 << 20, 16 << 20]  # con el segundo B se relee en cada banda de filas
 REPEATS = 1
 
 
@@ -14,6 +21,15 @@ def checksum(M: np.ndarray) -> float:
 
 def run():
     print(f"NumPy version: {np.__version__}")
+    with WorkerPool() as pool:
+        print(f"Worker pool ({pool.workers} workers): "
+              f"startup {pool.startup_s*1000:.1f} ms, warm-up {pool.warmup_s*1000:.1f} ms")
+        run_sizes(pool)
+        run_rectangular(pool)
+    run_out_of_core()
+
+
+def run_sizes(pool: WorkerPool):
     for n in SIZES:
         print(f"\n===== MATRIX SIZE: {n} =====")
         A = np.random.rand(n, n)
@@ -29,13 +45,13 @@ def run():
             print(f"Baseline local: {baseline_t:.1f} ms")
 
             t1 = time.time()
-            C2 = parallel_multiply(A, B)
+            C2 = parallel_multiply(A, B, pool=pool)
             t2 = time.time()
             parallel_t = (t2 - t1) * 1000
             print(f"Parallel local: {parallel_t:.1f} ms")
 
             t1 = time.time()
-            C3, stats = distributed_multiply(A, B)
+            C3, stats = distributed_multiply(A, B, pool=pool)
             t2 = time.time()
             dist_total_ms = (t2 - t1) * 1000
             print(f"Distributed MapReduce total: {dist_total_ms:.1f} ms")
@@ -43,8 +59,66 @@ def run():
             print(f"  map:    {stats['map_s']*1000:.1f} ms")
             print(f"  reduce: {stats['reduce_s']*1000:.1f} ms")
 
+            t1 = time.time()
+            C5, stats = distributed_multiply(A, B, combine=True, pool=pool)
+            t2 = time.time()
+            combine_total_ms = (t2 - t1) * 1000
+            print(f"Distributed MapReduce (worker-side reduce) total: {combine_total_ms:.1f} ms")
+            print(f"  prep:   {stats['prep_s']*1000:.1f} ms")
+            print(f"  map:    {stats['map_s']*1000:.1f} ms")
+            print(f"  reduce: {stats['reduce_s']*1000:.1f} ms")
+
+            t1 = time.time()
+            C4, stats = distributed_multiply(A, B, shared=True, pool=pool)
+            t2 = time.time()
+            shared_total_ms = (t2 - t1) * 1000
+            print(f"Distributed MapReduce (shared memory) total: {shared_total_ms:.1f} ms")
+            print(f"  prep:   {stats['prep_s']*1000:.1f} ms")
+            print(f"  map:    {stats['map_s']*1000:.1f} ms")
+            print(f"  reduce: {stats['reduce_s']*1000:.1f} ms")
+
             print("Checksums:",
-                  checksum(C1), checksum(C2), checksum(C3))
+                  checksum(C1), checksum(C2), checksum(C3), checksum(C5), checksum(C4))
+
+
+def run_rectangular(pool: WorkerPool):
+    for m, k, n in RECT_SHAPES:
+        print(f"\n===== MATRIX SHAPE: {m}x{k} @ {k}x{n} =====")
+        A = np.random.rand(m, k)
+        B = np.random.rand(k, n)
+        for mode in ("pickle", "combine", "shared"):
+            t1 = time.time()
+            C, stats = distributed_multiply(A, B, block_size=None, pool=pool,
+                                            combine=mode == "combine",
+                                            shared=mode == "shared")
+            t2 = time.time()
+            print(f"Distributed MapReduce ({mode}, tiles {stats['tile_shape']}): "
+                  f"{(t2 - t1) * 1000:.1f} ms, checksum {checksum(C)}")
+
+
+
+def run_out_of_core():
+    for m, k, n in OOC_SHAPES:
+        print(f"\n===== OUT-OF-CORE: {m}x{k} @ {k}x{n} =====")
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = {name: os.path.join(tmp, f"{name}.npy") for name in "ABC"}
+            A = np.random.rand(m, k)
+            B = np.random.rand(k, n)
+            np.save(paths["A"], A)
+            np.save(paths["B"], B)
+            expected = checksum(A @ B)
+            del A, B
+            for budget in OOC_BUDGETS:
+                C, stats = out_of_core_multiply(paths["A"], paths["B"], paths["C"], budget=budget)
+                print(f"Budget {budget >> 20} MB (tiles {stats['tile_shape']}, panel={stats['panel']}): "
+                      f"{stats['total_s']*1000:.1f} ms")
+                print(f"  read:    {stats['read_s']*1000:.1f} ms "
+                      f"({stats['bytes_read'] >> 20} MB, x{stats['read_amplification']:.2f}), "
+                      f"waiting {stats['read_wait_s']*1000:.1f} ms")
+                print(f"  compute: {stats['compute_s']*1000:.1f} ms")
+                print(f"  write:   {stats['write_s']*1000:.1f} ms")
+                print("  Checksums:", checksum(C), expected)
+                del C
 
 
 if __name__ == "__main__":
@@ -1,63 +1,269 @@
 import numpy as np
 import time
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
+
+from shared_arrays import share_array, release, run_attached
+from worker_pool import WorkerPool, acquire_pool
 
 BLOCK_SIZE = 256
 
 
+def tile_bounds(dim: int, block: int) -> list[tuple[int, int]]:
+    # La última tesela puede ser más pequeña (borde irregular), sin padding
+    return [(start, min(start + block, dim)) for start in range(0, dim, block)]
+
+
+def _balanced_block(dim: int, target: int) -> int:
+    # Mismo número de teselas que con `target`, pero repartidas a partes
+    # casi iguales para que el borde no quede como una tesela diminuta.
+    # Nunca 0: con dim == 0 no hay teselas, pero range(0, 0, 0) falla.
+    tiles = max(1, -(-dim // max(1, target)))
+    return max(1, -(-dim // tiles))
+
+
+def choose_block_sizes(m: int, k: int, n: int, workers: int,
+                       target: int = BLOCK_SIZE) -> tuple[int, int, int]:
+    bm, bk, bn = (_balanced_block(d, target) for d in (m, k, n))
+    # Al menos una tesela de salida por worker mientras los bloques no
+    # se hagan demasiado pequeños para BLAS.
+    while -(-m // bm) * -(-n // bn) < workers and max(bm, bn) > 32:
+        if bm >= bn:
+            bm = _balanced_block(m, -(-bm // 2))
+        else:
+            bn = _balanced_block(n, -(-bn // 2))
+    return bm, bk, bn
+
+
 def map_task(args):
     bi, bj, A_block, B_block = args
     return bi, bj, np.dot(A_block, B_block)
 
 
+def combine_task(args):
+    # Combiner: el worker es dueño de la tesela (bi, bj) y reduce sobre bk
+    # localmente, así que solo vuelve un bloque terminado por tarea.
+    bi, bj, A_panel, B_panel, bk = args
+    C_block = np.zeros((A_panel.shape[0], B_panel.shape[1]))
+    for k0 in range(0, A_panel.shape[1], bk):
+        C_block += np.dot(A_panel[:, k0:k0+bk], B_panel[k0:k0+bk, :])
+    return bi, bj, C_block
+
+
+def _shared_tile(A, B, C, i0, i1, j0, j1, bk):
+    C_block = C[i0:i1, j0:j1]
+    for k0 in range(0, A.shape[1], bk):
+        C_block += np.dot(A[i0:i1, k0:k0+bk], B[k0:k0+bk, j0:j1])
+
+
+def shared_map_task(args):
+    # Solo viajan coordenadas: A, B y C se leen/escriben en memoria compartida.
+    # Cada tarea es dueña de una tesela de C, así que no hay carreras.
+    (i0, i1), (j0, j1), bk, specs = args
+    run_attached(specs, _shared_tile, i0, i1, j0, j1, bk)
+    return i0, j0
+
+
+def _prepare_out(out: np.ndarray | None, shape: tuple[int, int], beta: float) -> np.ndarray:
+    # C = beta * C antes de sumar las teselas; sin out se reserva un C nuevo
+    if out is None:
+        return np.zeros(shape)
+    if out.shape != shape:
+        raise ValueError(f"out debe tener forma {shape}, no {out.shape}")
+    if beta == 0:
+        out.fill(0)
+    elif beta != 1:
+        out *= beta
+    return out
+
+
+def _add_tile(C: np.ndarray, i0: int, i1: int, j0: int, j1: int,
+              block: np.ndarray, alpha: float) -> None:
+    # El bloque llega del worker y es nuestro: se escala en su sitio
+    if alpha != 1:
+        block *= alpha
+    C[i0:i1, j0:j1] += block
+
+
+def _stats(mode, prep, map_, reduce, startup_s, workers, block_size, tiles, shape) -> dict:
+    m, k, n = shape
+    return {
+        "prep_s": prep[1] - prep[0],
+        "pool_startup_s": startup_s,
+        "map_s": map_[1] - map_[0],
+        "reduce_s": reduce[1] - reduce[0],
+        "total_s": ((prep[1] - prep[0]) + (map_[1] - map_[0])
+                    + (reduce[1] - reduce[0])),
+        "workers": workers,
+        "block_size": block_size,
+        "tile_shape": tiles,
+        "size": m,
+        "shape": (m, k, n),
+        "mode": mode,
+    }
+
+
 def distributed_multiply(A: np.ndarray, B: np.ndarray,
                          workers: int | None = None,
-                         block_size: int = BLOCK_SIZE) -> tuple[np.ndarray, dict]:
-    if workers is None:
+                         block_size: int | None = BLOCK_SIZE,
+                         shared: bool = False,
+                         combine: bool = False,
+                         pool: WorkerPool | None = None,
+                         out: np.ndarray | None = None,
+                         alpha: float = 1.0,
+                         beta: float = 0.0) -> tuple[np.ndarray, dict]:
+    # Con out: C = alpha * A @ B + beta * out, escrito en out (ver gemm)
+    if pool is not None:
+        workers = pool.workers
+    elif workers is None:
         workers = cpu_count()
 
-    n = A.shape[0]
-    assert n % block_size == 0, "n debe ser múltiplo del tamaño de bloque"
+    m, k = A.shape
+    k2, n = B.shape
+    if k != k2:
+        raise ValueError("dimensiones incompatibles: A es m×k y B debe ser k×n")
+
+    # block_size=None: tamaño de tesela elegido según la forma de A y B
+    if block_size is None:
+        tiles = choose_block_sizes(m, k, n, workers)
+    else:
+        tiles = (block_size, block_size, block_size)
 
+    if m == 0 or k == 0 or n == 0:
+        # Nada que repartir: C vacío, o beta * C (A @ B es cero) si k == 0
+        start = time.time()
+        C = _prepare_out(out, (m, n), beta)
+        end = time.time()
+        return C, _stats("empty", (start, start), (start, start), (start, end), 0.0,
+                         workers, block_size, tiles, (m, k, n))
+
+    gemm_args = (out, alpha, beta)
+    if shared:
+        return _shared_multiply(A, B, workers, block_size, tiles, pool, *gemm_args)
+    if combine:
+        return _combined_multiply(A, B, workers, block_size, tiles, pool, *gemm_args)
+
+    bm, bk, bn = tiles
+    rows, cols, inner = tile_bounds(m, bm), tile_bounds(n, bn), tile_bounds(k, bk)
     tasks = []
-    num_blocks = n // block_size
 
     prep_start = time.time()
-    for bi in range(num_blocks):
-        for bj in range(num_blocks):
-            for bk in range(num_blocks):
-                A_block = A[bi*block_size:(bi+1)*block_size,
-                          bk*block_size:(bk+1)*block_size]
-                B_block = B[bk*block_size:(bk+1)*block_size,
-                          bj*block_size:(bj+1)*block_size]
-                tasks.append((bi, bj, A_block, B_block))
+    for bi, (i0, i1) in enumerate(rows):
+        for bj, (j0, j1) in enumerate(cols):
+            for k0, k1 in inner:
+                tasks.append((bi, bj, A[i0:i1, k0:k1], B[k0:k1, j0:j1]))
     prep_end = time.time()
 
-    map_start = time.time()
-    with Pool(workers) as p:
+    with acquire_pool(pool, workers) as (p, startup_s):
+        map_start = time.time()
         results = list(p.imap_unordered(map_task, tasks))
-    map_end = time.time()
+        map_end = time.time()
 
     reduce_start = time.time()
-    C = np.zeros((n, n))
+    C = _prepare_out(out, (m, n), beta)
     for bi, bj, block_res in results:
-        i0 = bi * block_size
-        j0 = bj * block_size
-        C[i0:i0+block_size, j0:j0+block_size] += block_res
+        _add_tile(C, *rows[bi], *cols[bj], block_res, alpha)
     reduce_end = time.time()
 
-    stats = {
-        "prep_s": prep_end - prep_start,
-        "map_s": map_end - map_start,
-        "reduce_s": reduce_end - reduce_start,
-        "total_s": reduce_end - prep_start,
-        "workers": workers,
-        "block_size": block_size,
-        "size": n,
-    }
+    stats = _stats("pickle", (prep_start, prep_end), (map_start, map_end),
+                   (reduce_start, reduce_end), startup_s, workers,
+                   block_size, tiles, (m, k, n))
+    return C, stats
+
+
+def _combined_multiply(A: np.ndarray, B: np.ndarray, workers: int, block_size: int | None,
+                       tiles: tuple[int, int, int],
+                       pool: WorkerPool | None,
+                       out: np.ndarray | None = None,
+                       alpha: float = 1.0,
+                       beta: float = 0.0) -> tuple[np.ndarray, dict]:
+    m, k = A.shape
+    n = B.shape[1]
+    bm, bk, bn = tiles
+    rows, cols = tile_bounds(m, bm), tile_bounds(n, bn)
+
+    prep_start = time.time()
+    tasks = []
+    for bi, (i0, i1) in enumerate(rows):
+        A_panel = A[i0:i1, :]
+        for bj, (j0, j1) in enumerate(cols):
+            tasks.append((bi, bj, A_panel, B[:, j0:j1], bk))
+    prep_end = time.time()
+
+    with acquire_pool(pool, workers) as (p, startup_s):
+        map_start = time.time()
+        results = list(p.imap_unordered(combine_task, tasks))
+        map_end = time.time()
+
+    # Cada tesela llega ya reducida: solo se coloca en su sitio
+    reduce_start = time.time()
+    C = _prepare_out(out, (m, n), beta)
+    for bi, bj, block_res in results:
+        _add_tile(C, *rows[bi], *cols[bj], block_res, alpha)
+    reduce_end = time.time()
+
+    stats = _stats("combine", (prep_start, prep_end), (map_start, map_end),
+                   (reduce_start, reduce_end), startup_s, workers,
+                   block_size, tiles, (m, k, n))
     return C, stats
 
 
+def _shared_multiply(A: np.ndarray, B: np.ndarray, workers: int, block_size: int | None,
+                     tiles: tuple[int, int, int],
+                     pool: WorkerPool | None,
+                     out: np.ndarray | None = None,
+                     alpha: float = 1.0,
+                     beta: float = 0.0) -> tuple[np.ndarray, dict]:
+    m, k = A.shape
+    n = B.shape[1]
+    bm, bk, bn = tiles
+
+    prep_start = time.time()
+    shm_a, A_sh, spec_a = share_array(np.ascontiguousarray(A, dtype=np.float64))
+    shm_b, B_sh, spec_b = share_array(np.ascontiguousarray(B, dtype=np.float64))
+    shm_c, C_sh, spec_c = share_array(None, shape=(m, n))
+    specs = (spec_a, spec_b, spec_c)
+    tasks = [(row, col, bk, specs)
+             for row in tile_bounds(m, bm) for col in tile_bounds(n, bn)]
+    prep_end = time.time()
+
+    try:
+        with acquire_pool(pool, workers) as (p, startup_s):
+            map_start = time.time()
+            for _ in p.imap_unordered(shared_map_task, tasks):
+                pass
+            map_end = time.time()
+
+        # La reducción ya la hicieron los workers; solo queda sacar C del segmento
+        reduce_start = time.time()
+        if out is None and alpha == 1:
+            C = C_sh.copy()
+        else:
+            C = _prepare_out(out, (m, n), beta)
+            _add_tile(C, 0, m, 0, n, C_sh, alpha)
+        reduce_end = time.time()
+    finally:
+        del A_sh, B_sh, C_sh
+        for shm in (shm_a, shm_b, shm_c):
+            release(shm)
+
+    stats = _stats("shared", (prep_start, prep_end), (map_start, map_end),
+                   (reduce_start, reduce_end), startup_s, workers,
+                   block_size, tiles, (m, k, n))
+    return C, stats
+
+
+def gemm(A: np.ndarray, B: np.ndarray, C: np.ndarray | None = None,
+         alpha: float = 1.0, beta: float = 0.0, stats: dict | None = None,
+         **kwargs) -> np.ndarray:
+    # Misma firma que gemm() de TASK3: C = alpha * A @ B + beta * C, en C,
+    # y devuelve solo C. Los tiempos se vuelcan en stats si se pasa un dict.
+    # kwargs se pasan a distributed_multiply (workers, pool, shared, ...).
+    C, run_stats = distributed_multiply(A, B, out=C, alpha=alpha, beta=beta, **kwargs)
+    if stats is not None:
+        stats.update(run_stats)
+    return C
+
+
 if __name__ == "__main__":
     A = np.random.rand(512, 512)
     B = np.random.rand(512, 512)
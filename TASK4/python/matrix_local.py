@@ -1,5 +1,9 @@
 import numpy as np
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
+
+from mapreduce_matrix import tile_bounds
+from shared_arrays import share_array, release, run_attached
+from worker_pool import WorkerPool, acquire_pool
 
 
 def baseline_multiply(A: np.ndarray, B: np.ndarray) -> np.ndarray:
@@ -14,28 +18,44 @@ def baseline_multiply(A: np.ndarray, B: np.ndarray) -> np.ndarray:
     return C
 
 
-def _row_task(args):
-    row, A, B = args
-    n = B.shape[1]
-    row_res = np.zeros(n)
-    for j in range(n):
-        s = 0.0
-        for k in range(A.shape[1]):
-            s += A[row, k] * B[k, j]
-        row_res[j] = s
-    return row, row_res
+def _band(A, B, C, r0, r1):
+    np.dot(A[r0:r1], B, out=C[r0:r1])
 
 
-def parallel_multiply(A: np.ndarray, B: np.ndarray, workers: int | None = None) -> np.ndarray:
-    if workers is None:
-        workers = cpu_count()
+def _band_task(args):
+    # Banda contigua de filas; A, B y C se leen/escriben en memoria compartida
+    (r0, r1), specs = args
+    run_attached(specs, _band, r0, r1)
+    return r0, r1
 
-    n = A.shape[0]
-    C = np.zeros((n, n))
-    tasks = [(i, A, B) for i in range(n)]
 
-    with Pool(workers) as p:
-        for row, row_res in p.imap_unordered(_row_task, tasks):
-            C[row, :] = row_res
+def parallel_multiply(A: np.ndarray, B: np.ndarray, workers: int | None = None,
+                      pool: WorkerPool | None = None,
+                      band_rows: int | None = None) -> np.ndarray:
+    if pool is not None:
+        workers = pool.workers
+    elif workers is None:
+        workers = cpu_count()
+
+    m = A.shape[0]
+    n = B.shape[1]
+    if band_rows is None:
+        band_rows = max(1, -(-m // workers))
+
+    shm_a, A_sh, spec_a = share_array(np.ascontiguousarray(A, dtype=np.float64))
+    shm_b, B_sh, spec_b = share_array(np.ascontiguousarray(B, dtype=np.float64))
+    shm_c, C_sh, spec_c = share_array(None, shape=(m, n))
+    specs = (spec_a, spec_b, spec_c)
+    tasks = [(band, specs) for band in tile_bounds(m, band_rows)]
+
+    try:
+        with acquire_pool(pool, workers) as (p, _):
+            for _ in p.imap_unordered(_band_task, tasks):
+                pass
+        C = C_sh.copy()
+    finally:
+        del A_sh, B_sh, C_sh
+        for shm in (shm_a, shm_b, shm_c):
+            release(shm)
 
     return C
@@ -0,0 +1,178 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from mapreduce_matrix import BLOCK_SIZE, tile_bounds, _balanced_block
+
+# Bytes de teselas residentes a la vez (A, B con prefetch, C y temporal)
+MEMORY_BUDGET = 1 << 30
+
+
+def open_operand(src, mode: str = "r") -> np.ndarray:
+    # Ruta a .npy -> memmap (no se lee nada todavía); np.memmap o ndarray
+    # se usan tal cual.
+    if isinstance(src, (str, os.PathLike)):
+        return np.load(src, mmap_mode=mode)
+    return src
+
+
+def create_output(path, shape: tuple[int, int], dtype=np.float64) -> np.memmap:
+    # .npy con cabecera, para poder reabrirlo con np.load(mmap_mode=...)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def plan_tiles(m: int, k: int, n: int, itemsize: int,
+               budget: int = MEMORY_BUDGET,
+               target: int = BLOCK_SIZE) -> tuple[int, int, int, bool]:
+    # Devuelve (bm, bk, bn, panel). Con panel=True la banda A[i0:i1, :]
+    # entera queda en memoria mientras se recorren todas las columnas de C,
+    # así A se lee del disco una sola vez y solo B se vuelve a leer por banda.
+    elems = budget // itemsize
+    bk = _balanced_block(k, target)
+    bn = _balanced_block(n, target)
+    # B se lee con un bloque de adelanto: dos bloques bk×bn en vuelo
+    fixed = 2 * bk * bn
+    per_row = k + bk + 2 * bn  # panel de A + bloque de A en vuelo + tesela de C + temporal
+    if fixed + per_row * min(m, target) <= elems:
+        bm = min(m, max(target, (elems - fixed) // per_row))
+        return _balanced_block(m, bm), bk, bn, True
+    # Sin sitio para el panel: A también se lee por bloques
+    # (dos de A y dos de B con el adelanto, tesela de C y temporal)
+    side = max(1, int((elems / 6) ** 0.5))
+    bm, bk, bn = (_balanced_block(d, min(target, side)) for d in (m, k, n))
+    return bm, bk, bn, False
+
+
+def _schedule(rows, cols, inner):
+    # Orden de teselas: banda de filas a banda de filas; dentro de cada una
+    # las columnas y los bloques k van en serpentina, de modo que el último
+    # bloque de A usado en una tesela es el primero de la siguiente.
+    # Generador: con matrices enormes la lista entera no cabría en memoria.
+    for i in range(len(rows)):
+        col_order = range(len(cols)) if i % 2 == 0 else range(len(cols) - 1, -1, -1)
+        for turn, j in enumerate(col_order):
+            k_order = range(len(inner)) if turn % 2 == 0 else range(len(inner) - 1, -1, -1)
+            yield i, j, k_order
+
+
+def _tile_products(steps, panel):
+    # Productos de teselas en orden de consumo: (i, j, kk, step, read_a).
+    # read_a indica si el bloque A[i, kk] hay que leerlo o sigue en la caché:
+    # con panel se conserva toda la banda, sin panel solo el último bloque.
+    cached_row, cached = None, set()
+    for i, j, k_order in steps:
+        if cached_row != i:
+            cached_row, cached = i, set()
+        for step, kk in enumerate(k_order):
+            read_a = kk not in cached
+            if read_a:
+                if not panel:
+                    cached.clear()
+                cached.add(kk)
+            yield i, j, kk, step, read_a
+
+
+def out_of_core_multiply(A, B, out, budget: int = MEMORY_BUDGET,
+                         block_size: int = BLOCK_SIZE) -> tuple[np.ndarray, dict]:
+    # A, B: rutas .npy o np.memmap; out: ruta (se crea) o memmap de salida.
+    # Cada tesela de C se acumula en memoria sobre k y se escribe una vez.
+    A = open_operand(A)
+    B = open_operand(B)
+    m, k = A.shape
+    k2, n = B.shape
+    assert k == k2, "dimensiones incompatibles: A es m×k y B debe ser k×n"
+    dtype = np.result_type(A.dtype, B.dtype)
+    if not isinstance(out, np.ndarray):
+        out = create_output(out, (m, n), dtype)
+    assert out.shape == (m, n), "out debe tener forma m×n"
+
+    bm, bk, bn, panel = plan_tiles(m, k, n, dtype.itemsize, budget, block_size)
+    rows, cols, inner = tile_bounds(m, bm), tile_bounds(n, bn), tile_bounds(k, bk)
+
+    io = {"read_s": 0.0, "bytes_read": 0}
+
+    def read(M, r, c):
+        # Se ejecuta en el hilo de E/S: np.array fuerza la lectura del memmap
+        start = time.time()
+        tile = np.array(M[r[0]:r[1], c[0]:c[1]], dtype=dtype)
+        io["read_s"] += time.time() - start
+        io["bytes_read"] += tile.nbytes
+        return tile
+
+    wait_s = compute_s = write_s = 0.0
+    bytes_written = 0
+    a_cache: dict[int, np.ndarray] = {}
+    a_cache_row = None
+    last_step = len(inner) - 1
+    T = np.empty((bm, bn), dtype=dtype)
+    C_tile = np.empty((bm, bn), dtype=dtype)
+
+    total_start = time.time()
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        def fetch(product):
+            # Pide al hilo de E/S los bloques de A (si no están en caché) y B
+            i, j, kk, _, read_a = product
+            a = reader.submit(read, A, rows[i], inner[kk]) if read_a else None
+            return product, a, reader.submit(read, B, inner[kk], cols[j])
+
+        # Un producto de adelanto: sus lecturas se solapan con el cálculo
+        # del actual. El hilo de E/S las atiende en orden de petición.
+        fetches = map(fetch, _tile_products(_schedule(rows, cols, inner), panel))
+        pending = next(fetches, None)
+        while pending is not None:
+            (i, j, kk, step, _), a_future, b_future = pending
+            pending = next(fetches, None)
+            (i0, i1), (j0, j1) = rows[i], cols[j]
+            C_view = C_tile[:i1 - i0, :j1 - j0]
+
+            start = time.time()
+            if a_future is not None:
+                A_tile = a_future.result()
+                if a_cache_row != i or not panel:
+                    a_cache.clear()
+                    a_cache_row = i
+                a_cache[kk] = A_tile
+            else:
+                A_tile = a_cache[kk]
+            B_tile = b_future.result()
+            wait_s += time.time() - start
+
+            start = time.time()
+            if step == 0:
+                np.matmul(A_tile, B_tile, out=C_view)
+            else:
+                T_view = T[:i1 - i0, :j1 - j0]
+                np.matmul(A_tile, B_tile, out=T_view)
+                C_view += T_view
+            compute_s += time.time() - start
+
+            if step == last_step:
+                start = time.time()
+                out[i0:i1, j0:j1] = C_view
+                write_s += time.time() - start
+                bytes_written += C_view.nbytes
+
+    start = time.time()
+    if isinstance(out, np.memmap):
+        out.flush()
+    write_s += time.time() - start
+    total_s = time.time() - total_start
+
+    stats = {
+        "read_s": io["read_s"],
+        "read_wait_s": wait_s,
+        "compute_s": compute_s,
+        "write_s": write_s,
+        "total_s": total_s,
+        "bytes_read": io["bytes_read"],
+        "bytes_written": bytes_written,
+        # Lecturas respecto a leer A y B una sola vez (1.0 = óptimo)
+        "read_amplification": io["bytes_read"] / max(1, (A.size + B.size) * dtype.itemsize),
+        "tile_shape": (bm, bk, bn),
+        "panel": panel,
+        "shape": (m, k, n),
+        "mode": "out_of_core",
+    }
+    return out, stats
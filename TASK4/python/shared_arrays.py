@@ -0,0 +1,55 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+def _open_segment(name: str | None = None, size: int = 0) -> shared_memory.SharedMemory:
+    create = name is None
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=create)
+    except TypeError:
+        # Python < 3.13 no admite track=
+        return shared_memory.SharedMemory(name=name, create=create, size=size)
+
+
+def share_array(A: np.ndarray | None, shape=None, dtype=np.float64):
+    # spec = (name, shape, dtype) es lo único que viaja a los workers
+    if A is not None:
+        shape, dtype = A.shape, A.dtype
+    dtype = np.dtype(dtype)
+    nbytes = max(1, int(np.prod(shape)) * dtype.itemsize)
+    shm = _open_segment(size=nbytes)
+    view = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    if A is not None:
+        view[...] = A
+    else:
+        view.fill(0)
+    return shm, view, (shm.name, tuple(shape), dtype.str)
+
+
+def release(shm: shared_memory.SharedMemory) -> None:
+    shm.close()
+    shm.unlink()
+
+
+def run_attached(specs, func, *args):
+    # Abre los segmentos de specs, llama a func(*vistas, *args) y los cierra
+    # al acabar la tarea. Un worker de un pool persistente no debe quedarse
+    # con el mapeo: tras el unlink() del padre, la memoria de /dev/shm solo
+    # se libera cuando el último proceso que la mapea la cierra.
+    # func no debe devolver vistas de los segmentos.
+    shms = []
+    try:
+        for spec in specs:
+            shms.append(_open_segment(spec[0]))
+        views = [np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+                 for shm, (_, shape, dtype) in zip(shms, specs)]
+        result = func(*views, *args)
+        del views
+        return result
+    finally:
+        for shm in shms:
+            try:
+                shm.close()
+            except BufferError:
+                # Con una excepción en func el traceback aún retiene vistas;
+                # el mapeo se libera cuando se recolecten
+                pass
@@ -0,0 +1,59 @@
+import gc
+import os
+
+import numpy as np
+import pytest
+
+from mapreduce_matrix import gemm
+from matrix_local import parallel_multiply
+from worker_pool import WorkerPool
+
+SHM = "/dev/shm"
+N = 512  # 3 segmentos de 2 MB: muy por encima del ruido de /dev/shm
+
+pytestmark = pytest.mark.skipif(not os.path.isdir(SHM), reason="sin /dev/shm")
+
+
+def shm_used():
+    st = os.statvfs(SHM)
+    return (st.f_blocks - st.f_bfree) * st.f_frsize
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with WorkerPool(2) as p:
+        yield p
+
+
+@pytest.fixture(scope="module")
+def operands():
+    rng = np.random.default_rng(0)
+    return rng.random((N, N)), rng.random((N, N))
+
+
+def check_released(pool, func):
+    # El pool sigue vivo: sus workers no deben retener los segmentos
+    func()
+    gc.collect()
+    before = shm_used()
+    for _ in range(3):
+        func()
+    gc.collect()
+    assert shm_used() - before < N * N * 8
+    pids = [w.pid for w in pool.pool._pool]
+    for pid in pids:
+        with open(f"/proc/{pid}/maps") as f:
+            assert "/dev/shm/psm_" not in f.read()
+
+
+def test_gemm_shared_releases_segments(pool, operands):
+    A, B = operands
+    C = gemm(A, B, pool=pool, shared=True, block_size=128)
+    np.testing.assert_allclose(C, A @ B)
+    check_released(pool, lambda: gemm(A, B, pool=pool, shared=True, block_size=128))
+
+
+def test_parallel_multiply_releases_segments(pool, operands):
+    A, B = operands
+    np.testing.assert_allclose(parallel_multiply(A, B, pool=pool), A @ B)
+    check_released(pool, lambda: parallel_multiply(A, B, pool=pool))
@@ -0,0 +1,127 @@
+import ctypes
+import os
+import time
+from contextlib import contextmanager
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+
+
+def _warm_task(_):
+    # Fuerza la inicialización de NumPy/BLAS en el worker
+    M = np.ones((64, 64))
+    return float(np.dot(M, M)[0, 0])
+
+
+# Funciones con las que OpenBLAS (según la build) y MKL fijan sus hilos
+_BLAS_SETTERS = ("openblas_set_num_threads", "openblas_set_num_threads64_",
+                 "scipy_openblas_set_num_threads", "scipy_openblas_set_num_threads64_",
+                 "MKL_Set_Num_Threads")
+_BLAS_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def _set_blas_threads(num: int) -> None:
+    # Inicializador de cada worker. Con fork la BLAS ya viene cargada del
+    # padre y no vuelve a leer las variables de entorno (solo sirven para
+    # procesos que lance el worker): hay que fijar los hilos en la biblioteca.
+    os.environ.update(dict.fromkeys(_BLAS_ENV, str(num)))
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=num, user_api="blas")  # sin restaurar: todo el worker
+        return
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/maps") as f:
+            paths = {line.split()[-1] for line in f
+                     if "blas" in line.lower() or "mkl_rt" in line}
+    except OSError:
+        return
+    for path in paths:
+        try:
+            lib = ctypes.CDLL(path)
+        except OSError:
+            continue
+        for name in _BLAS_SETTERS:
+            setter = getattr(lib, name, None)
+            if setter is not None:
+                setter(num)
+                break
+
+
+def _new_pool(workers: int):
+    # El resource tracker debe existir antes de crear los workers para que
+    # lo hereden; si no, cada worker arranca el suyo y da por "filtrados"
+    # los segmentos de memoria compartida que adjunta.
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+        resource_tracker.ensure_running()
+    # Cada worker ya es un proceso por núcleo: su BLAS se reparte los que
+    # sobran en lugar de usar todos y sobresuscribir la CPU
+    blas_threads = max(1, cpu_count() // workers)
+    return Pool(workers, initializer=_set_blas_threads, initargs=(blas_threads,))
+
+
+class WorkerPool:
+    """Pool de procesos de larga duración reutilizable entre llamadas.
+
+    distributed_multiply, parallel_multiply y frequent_items aceptan
+    pool=WorkerPool(...) y lo usan en lugar de crear uno propio.
+    """
+
+    def __init__(self, workers: int | None = None, warmup: bool = True):
+        self.workers = workers if workers is not None else cpu_count()
+        self.startup_s = 0.0
+        self.warmup_s = 0.0
+        self._warmup_on_start = warmup
+        self._pool = None
+
+    def start(self) -> "WorkerPool":
+        if self._pool is None:
+            start = time.time()
+            self._pool = _new_pool(self.workers)
+            self.startup_s = time.time() - start
+            if self._warmup_on_start:
+                self.warmup()
+        return self
+
+    def warmup(self, func=_warm_task) -> float:
+        start = time.time()
+        self.pool.map(func, range(self.workers), chunksize=1)
+        self.warmup_s = time.time() - start
+        return self.warmup_s
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self.start()
+        return self._pool
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> "WorkerPool":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+@contextmanager
+def acquire_pool(pool: WorkerPool | None, workers: int):
+    # Devuelve (pool de multiprocessing, segundos de arranque). Si no se
+    # recibe un WorkerPool se crea uno efímero como antes.
+    if pool is not None:
+        yield pool.pool, 0.0
+        return
+    start = time.time()
+    p = _new_pool(workers)
+    startup_s = time.time() - start
+    try:
+        yield p, startup_s
+    finally:
+        p.terminate()
+        p.join()